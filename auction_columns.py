@@ -0,0 +1,173 @@
+import mmap
+import os
+import struct
+from array import array
+from enum import IntEnum
+
+
+class TimeLeft(IntEnum):
+    """Auction time_left, stored as its one byte code."""
+    SHORT = 0
+    MEDIUM = 1
+    LONG = 2
+    VERY_LONG = 3
+
+
+TIME_LEFT = tuple(time_left.name for time_left in TimeLeft)
+TIME_LEFT_CODES = {time_left.name: time_left for time_left in TimeLeft}
+
+# (attribute, array typecode) in file order
+COLUMNS = (('ids', 'q'), ('item_ids', 'i'), ('quantities', 'i'),
+           ('prices', 'd'), ('time_left', 'b'))
+HEADER = struct.Struct('<4sHQ')  # magic, version, number of auctions
+MAGIC = b'AUCC'
+VERSION = 1
+
+
+class Auction:
+    """One parsed auction, as read from AuctionColumns."""
+    __slots__ = ('id', 'item_id', 'quantity', 'price', 'time_left')
+
+    def __init__(self, auc_id, item_id, quantity, price, time_left):
+        self.id = auc_id
+        self.item_id = item_id
+        self.quantity = quantity
+        self.price = price
+        self.time_left = TimeLeft(time_left)
+
+    def __eq__(self, other):
+        return isinstance(other, Auction) and all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return (f"Auction({self.id}, {self.item_id}, {self.quantity}, "
+                f"{self.price}, {self.time_left.name})")
+
+
+class AuctionColumns:
+    """Parsed auctions stored as parallel arrays instead of one dict per
+    auction: ids, item_ids, quantities, prices (gold) and time_left codes
+    (TimeLeft values).
+    """
+
+    def __init__(self):
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        """Returns the 'i'th auction as an Auction record."""
+        return Auction(self.ids[i], self.item_ids[i], self.quantities[i],
+                       self.prices[i], self.time_left[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, auc_id, item_id, quantity, price, time_left):
+        self.ids.append(auc_id)
+        self.item_ids.append(item_id)
+        self.quantities.append(quantity)
+        self.prices.append(price)
+        self.time_left.append(TIME_LEFT_CODES[time_left])
+
+    def take(self, indexes):
+        """Returns new AuctionColumns with the rows at 'indexes', in order."""
+        columns = AuctionColumns()
+        for name, typecode in COLUMNS:
+            column = getattr(self, name)
+            setattr(columns, name, array(typecode, [column[i] for i in indexes]))
+        return columns
+
+    def save(self, path):
+        """Writes the raw columns to 'path', replacing it atomically."""
+        with open(f"{path}.part", 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, len(self)))
+            for name, _ in COLUMNS:
+                getattr(self, name).tofile(file)
+        os.replace(f"{path}.part", path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads columns written by save() through a memory map, so every
+        column is copied once straight from the page cache.
+        """
+        columns = cls()
+        with open(path, 'rb') as file, \
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, length = HEADER.unpack_from(data)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not an auction columns file")
+            offset = HEADER.size
+            with memoryview(data) as view:
+                for name, _ in COLUMNS:
+                    column = getattr(columns, name)
+                    size = length * column.itemsize
+                    column.frombytes(view[offset:offset + size])
+                    offset += size
+        return columns
+
+    @classmethod
+    def from_dicts(cls, auctions):
+        """Builds columns from the old one-dict-per-auction format."""
+        columns = cls()
+        for auc in auctions:
+            columns.append(auc['id'], auc['item_id'], auc['quantity'],
+                           auc['price'], auc['time_left'])
+        return columns
+
+
+def filter_sorted(auctions, price_ceilings):
+    """Returns the auctions of tracked items sorted by (item_id, price, -id).\n
+    'price_ceilings' maps every tracked item_id to the highest price (gold) an
+    auction may have to be kept. One dict lookup per auction, however many
+    items are tracked.
+    """
+    ids, prices = auctions.ids, auctions.prices
+    item_ids = auctions.item_ids
+    indexes = []
+    for i, item_id in enumerate(item_ids):
+        ceiling = price_ceilings.get(item_id)
+        if ceiling is not None and prices[i] <= ceiling:
+            indexes.append(i)
+    indexes.sort(key=lambda i: (item_ids[i], prices[i], -ids[i]))
+    return auctions.take(indexes)
+
+
+def price_medians(auctions):
+    """Returns {item_id: median price} of auctions sorted by filter_sorted."""
+    item_ids, prices = auctions.item_ids, auctions.prices
+    medians = {}
+    start = 0
+    for end in range(1, len(auctions) + 1):
+        if end == len(auctions) or item_ids[end] != item_ids[start]:
+            middle = (start + end) // 2
+            if (end - start) % 2:
+                medians[item_ids[start]] = prices[middle]
+            else:
+                medians[item_ids[start]] = (prices[middle - 1] + prices[middle]) / 2
+            start = end
+    return medians
+
+
+def concatenate_chunks(auctions, own_ids):
+    """Concatenates adjacent auctions of the same item with the same price
+    and ownership.\n
+    Returns [item_id, price, quantity, time_left, own] rows, where time_left
+    is that of the first auction of every chunk.
+    """
+    ids, prices, quantities = auctions.ids, auctions.prices, auctions.quantities
+    item_ids = auctions.item_ids
+    chunks = []
+    for i in range(len(auctions)):
+        own = 1 if ids[i] in own_ids else 0
+        item_id, price = item_ids[i], prices[i]
+        if (chunks and item_id == chunks[-1][0] and price == chunks[-1][1]
+                and own == chunks[-1][4]):
+            chunks[-1][2] += quantities[i]
+        else:
+            chunks.append([item_id, price, quantities[i],
+                           TIME_LEFT[auctions.time_left[i]], own])
+    return chunks
@@ -1,20 +1,45 @@
 import datetime
 import json
+import multiprocessing
 import os
 import pickle
 import requests
 import sqlite3
 import time
-from multiprocessing import Process, Queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 from slpp import slpp as lua
 from wowapi import WowApi as wowapi
 
+import history
+import market
+import rollups
+import storage
 from settings import *
+from auction_columns import TIME_LEFT, AuctionColumns
+from auction_stream import AuctionStream, item_filter, iter_auctions, open_dump
+from checkpoints import CheckpointStore, LastSession
+from external_sort import ExternalSorter
+from instrumentation import Instrumentation
+from lua_export import LuaExport
+from outliers import OutlierRules
 from own_auctions import OwnAuctions
+from progress import PipelineProgress
+from scheduler import UpdateScheduler
+if ENGINE == 'numpy':
+    from numpy_engine import concatenate_chunks, filter_sorted
+else:
+    from auction_columns import concatenate_chunks, filter_sorted
+
+# Bump when create_output_databases changes the tables of a db
+CURRENT_SCHEMA = 2
+HISTORICAL_SCHEMA = 2
 
 
 class Realm:
+    __slots__ = ('name', 'slug', 'code', 'update_interval', 'last_update',
+                 'last_check', 'json_link', 'connected_realm_id', 'url', 'sellers')
+
     def __init__(self, row):
         self.name = row[1]
         self.slug = row[2]
@@ -23,28 +48,29 @@ class Realm:
         self.last_update = row[5]
         self.last_check = row[6]
         self.json_link = row[7]
+        self.connected_realm_id = row[11]
         self.url = f'data/wow/connected-realm/{row[11]}/auctions' + \
             '?namespace=dynamic-eu&locale=en_GB'
 
-        # Seller Hashmap
-        self.sellers = {}
-        for seller in row[12]:
-            self.sellers[seller] = True
+        # Tracked sellers' full names
+        self.sellers = tuple(row[12])
 
     def __str__(self):
         return self.name
 
     def update_db(self):
         """Updates Realm instance's row"""
-        conn = sqlite3.connect(REALMS)
-        c = conn.cursor()
-        c.execute("""UPDATE realms SET last_update = ?, last_check = ?
-                WHERE name = ? AND (last_update != ? OR last_update IS NULL)""",
-                  (self.last_update, self.last_check, self.name, self.last_update))
-        conn.commit()
+        with storage.transaction(REALMS) as c:
+            c.execute("""UPDATE realms SET last_update = ?, last_check = ?, update_interval = ?
+                    WHERE name = ? AND (last_update != ? OR last_update IS NULL)""",
+                      (self.last_update, self.last_check, self.update_interval,
+                       self.name, self.last_update))
 
 
 class Item:
+    __slots__ = ('item_id', 'name', 'short_name', 'category_id', 'position',
+                 'stack_sizes')
+
     def __init__(self, row):
         self.item_id = row[0]
         self.name = row[1]
@@ -57,232 +83,454 @@ class Item:
         return self.name
 
 
+def read_auctions(path, item_ids):
+    """Yields auctions of 'item_ids' from a downloaded or archived json dump.\n
+    With 'streaming_ingestion' the dump is decoded one auction at a time, so
+    it's never held in memory whole.
+    """
+    auction_filter = item_filter(item_ids)
+    with open_dump(path) as body:
+        if STREAMING_INGESTION:
+            yield from iter_auctions(body, auction_filter)
+        else:
+            yield from filter(auction_filter, json.load(body)['auctions'])
+
+
+def parse_dump(path, realm_name, realm_slug, price_ceilings, instrumentation=None,
+               temp_db=True):
+    """Parses a downloaded json dump into (auction_chunks, seller_auction_chunks).\n
+    'auction_chunks' are AuctionColumns of the items in 'price_ceilings'
+    ({item_id: price ceiling}) sorted by (item_id, price, -id).
+    Sellers aren't in the API anymore, so 'seller_auction_chunks' is empty.
+    Dumps too big to sort within SORT_MEMORY_BUDGET_MB are sorted on disk.
+    Every step is recorded as a stage of 'instrumentation'. 'realm_slug'
+    names the parse's temp files, the realm's temp db unless 'temp_db=False'.
+    """
+    instrumentation = instrumentation or Instrumentation()
+    print(f"{realm_name} updating...")
+    with instrumentation.stage(realm_name, 'decode') as stage:
+        # ignore auctions meant to just push up the mean price
+        auctions = ExternalSorter(f"{TEMP_FOLDER}/runs/{realm_slug}", price_ceilings,
+                                  SORT_MEMORY_BUDGET_MB << 20, filter_sorted)
+        for auc in read_auctions(path, price_ceilings):
+            auctions.append(auc['id'], auc['item']['id'], auc['quantity'],
+                            auc['unit_price'] / 10000, auc['time_left'])
+        stage['bytes'] = os.path.getsize(path)
+        stage['records_out'] = auctions.count
+
+    with instrumentation.stage(realm_name, 'filter_sort') as stage:
+        parsed_auctions = auctions.sorted()
+        stage['records_in'] = auctions.count
+        stage['records_out'] = len(parsed_auctions)
+        stage['runs'] = len(auctions.runs)
+
+    if temp_db:
+        with instrumentation.stage(realm_name, 'temp_db') as stage, \
+                storage.transaction(f"{TEMP_FOLDER}/{realm_slug}.sqlite3") as c:
+            stage['records_in'] = len(parsed_auctions)
+            # Create or truncate table then dump parsed auctions in it
+            c.execute("""CREATE TABLE IF NOT EXISTS auctions (
+                id INTEGER,
+                item_id INTEGER,
+                quantity INTEGER,
+                unit_price INTEGER,
+                time_left TEXT)""")
+            c.execute("DELETE FROM auctions")
+            c.executemany("""INSERT INTO auctions (id, item_id, quantity, unit_price, time_left)
+                    VALUES(?, ?, ?, ?, ?)""",
+                          zip(parsed_auctions.ids,
+                              parsed_auctions.item_ids,
+                              parsed_auctions.quantities,
+                              (round(price * 10000) for price in parsed_auctions.prices),
+                              (TIME_LEFT[code] for code in parsed_auctions.time_left)))
+
+    print(f"> Finished updating: {realm_name}")
+
+    return (parsed_auctions, [])
+
+
+def parse_dump_to_file(path, realm_name, realm_slug, price_ceilings, temp_db=True):
+    """Runs parse_dump and hands its auctions back as a columns file.\n
+    Module level so it can run in DataParser.update_all's process pool. Only
+    the file's path goes through the pool, not the pickled auctions.
+    Returns (columns file path, the worker's instrumentation records).
+    """
+    instrumentation = Instrumentation(PROFILE_STAGES, TEMP_FOLDER)
+    parsed_data = parse_dump(path, realm_name, realm_slug, price_ceilings,
+                             instrumentation, temp_db)
+    columns_path = f"{TEMP_FOLDER}/{realm_slug}.columns"
+    with instrumentation.stage(realm_name, 'handoff') as stage:
+        parsed_data[0].save(columns_path)
+        stage['records_in'] = len(parsed_data[0])
+        stage['bytes'] = os.path.getsize(columns_path)
+    return (columns_path, instrumentation.records)
+
+
+def use_temp_folder(temp_folder):
+    global TEMP_FOLDER
+    TEMP_FOLDER = temp_folder
+
+
+def parser_pool(max_parsers):
+    """Process pool for parse_dump_to_file.\n
+    Workers are started by a fork server (spawned where there is none), never
+    forked from this process: its download and scheduler threads may hold
+    locks, such as storage's, that a forked child would wait on forever.
+    Workers start with this process' TEMP_FOLDER.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'forkserver' if 'forkserver' in methods else 'spawn')
+    return ProcessPoolExecutor(max_parsers, mp_context=context,
+                               initializer=use_temp_folder, initargs=(TEMP_FOLDER, ))
+
+
+def diff_chunks(rows, chunks):
+    """Diffs a realm's auction_chunks rows against its new concatenated chunks.\n
+    Rows and chunks are matched by (item_id, price, own) and, when that key
+    repeats, by the order of its occurrences.
+    Returns (chunks to insert, (stack_size, time_left, chunk_id) updates,
+    chunk_ids to delete).
+    """
+    def keyed(entries, key):
+        occurrences = {}
+        for entry in entries:
+            base_key = key(entry)
+            occurrences[base_key] = occurrences.get(base_key, 0) + 1
+            yield base_key + (occurrences[base_key], ), entry
+
+    old_rows = dict(keyed(rows, lambda row: (row[1], row[2], row[5])))
+    inserts, updates = [], []
+    for key, chunk in keyed(chunks, lambda chunk: (chunk[0], chunk[1], chunk[4])):
+        row = old_rows.pop(key, None)
+        if row is None:
+            inserts.append(chunk)
+        elif (row[3], row[4]) != (chunk[2], chunk[3]):
+            updates.append((chunk[2], chunk[3], row[0]))
+    deletes = [row[0] for row in old_rows.values()]
+    return (inserts, updates, deletes)
+
+
 class DataParser:
     """Parses json files provided by Blizard's Auction API into useful data
     for 'MyAH' (django webapp) and 'Multiboxer' (auction house addon).
     """
 
     def __init__(self):
-        def load_last_session():
+        def migrate_last_session():
+            """Splits a session pickled before per realm checkpoints into
+            checkpoints, once.
+            """
+            path = f"{TEMP_FOLDER}/_serialized_data.pickle"
+            if not os.path.exists(path):
+                return
             try:
-                with open(f"{TEMP_FOLDER}/_serialized_data.pickle", 'rb') as old:
-                    return pickle.load(old)
-            except:
-                return ({}, {})
+                with open(path, 'rb') as old:
+                    auction_chunks = pickle.load(old)[0]
+            except (OSError, EOFError, IndexError, ValueError, pickle.UnpicklingError) as err:
+                # Kept as .migrated below, for inspection
+                print(f"> Couldn't read {path}: {err!r}")
+                auction_chunks = {}
+            for realm_name, auctions in auction_chunks.items():
+                realm = self.realms.get(realm_name)
+                if not realm or os.path.exists(self.checkpoints.path(realm.slug)):
+                    continue
+                # Sessions pickled before AuctionColumns hold lists of dicts
+                if isinstance(auctions, list):
+                    auctions = AuctionColumns.from_dicts(auctions)
+                self.checkpoints.save(realm.slug, auctions)
+            os.replace(path, f"{path}.migrated")
 
         def realm_objects_dict():
-            conn = sqlite3.connect(REALMS)
-            c = conn.cursor()
-            c.execute("SELECT * FROM realms")
-
-            realms = {}
-            for row in c.fetchall():
-                c.execute("SELECT full_name FROM sellers WHERE realm_id = ?",
-                          (row[0], ))
-                sellers = [x[0] for x in c.fetchall()]
-                realms[row[1]] = Realm(row + (sellers, ))
-            conn.close()
-            return realms
+            # One query per table, however many realms there are
+            sellers = {}
+            for realm_id, full_name in storage.query(
+                    REALMS, "SELECT realm_id, full_name FROM sellers"):
+                sellers.setdefault(realm_id, []).append(full_name)
+            return {row[1]: Realm(row + (sellers.get(row[0], []), ))
+                    for row in storage.query(REALMS, "SELECT * FROM realms")}
 
         def item_objects_dict():
-            conn = sqlite3.connect(ITEMS)
-            c = conn.cursor()
-            c.execute("SELECT * FROM items")
-
-            items = {}
-            for row in c.fetchall():
-                c.execute("SELECT stack_size FROM stack_sizes WHERE category_id = ?",
-                          (row[3], ))
-                stack_sizes = [x[0] for x in c.fetchall()]
-                items[row[1]] = Item(row + (stack_sizes, ))
-            return items
+            stack_sizes = {}
+            for category_id, stack_size in storage.query(
+                    ITEMS, "SELECT category_id, stack_size FROM stack_sizes"):
+                stack_sizes.setdefault(category_id, []).append(stack_size)
+            return {row[1]: Item(row + (stack_sizes.get(row[3], []), ))
+                    for row in storage.query(ITEMS, "SELECT * FROM items")}
 
         def create_output_databases():
-            """Creates output dbs tables if they don't exist."""
-
-            conn = sqlite3.connect(CURRENT_DATA)
-            c = conn.cursor()
-            c.execute("""CREATE TABLE IF NOT EXISTS auction_chunks (
-                chunk_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
-                realm TEXT,
-                item_id INTEGER,
-                quantity INTEGER,
-                price REAL,
-                stack_size INTEGER,
-                time_left TEXT)""")
-            conn.close()
-
-            conn = sqlite3.connect(HISTORICAL_DATA)
-            c = conn.cursor()
-            c.execute("""CREATE TABLE IF NOT EXISTS snapshots (
-                    snapshot_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
-                    timestamp INTEGER,
-                    realm TEXT)""")
-            c.execute("""CREATE TABLE IF NOT EXISTS chunks (
+            """Creates output dbs tables and migrates old ones, once per
+            schema version.
+            """
+            def create_current_tables(c):
+                c.execute("""CREATE TABLE IF NOT EXISTS auction_chunks (
                     chunk_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
-                    first_seen INTEGER,
+                    realm TEXT,
                     item_id INTEGER,
+                    quantity INTEGER,
                     price REAL,
                     stack_size INTEGER,
-                    time_left TEXT)""")
-            c.execute("""CREATE TABLE IF NOT EXISTS snapshot_chunk_events (
-                    snapshot_id INTEGER,
-                    chunk_id INTEGER,
-                    event TEXT,
-                    quantity TEXT,
-                    FOREIGN KEY (snapshot_id) REFERENCES snapshots(snapshot_id),
-                    FOREIGN KEY (chunk_id) REFERENCES chunks(chunk_id),
-                    PRIMARY KEY (snapshot_id, chunk_id))""")
-            c.execute("""CREATE TABLE IF NOT EXISTS auctions (
-                    auc_id INTEGER NOT NULL,
-                    chunk_id INTEGER,
-                    last_seen INTEGER,
-                    FOREIGN KEY (chunk_id) REFERENCES chunks(chunk_id),
-                    PRIMARY KEY (auc_id, chunk_id))""")
-            conn.close()
+                    time_left TEXT,
+                    own INTEGER)""")
+                c.execute("""CREATE INDEX IF NOT EXISTS auction_chunks_realm_item
+                    ON auction_chunks (realm, item_id, price)""")
+                market.create_tables(c)
+
+            def create_historical_tables(c):
+                history.create_tables(c)
+                rollups.create_tables(c)
+
+            storage.ensure_schema(CURRENT_DATA, CURRENT_SCHEMA, create_current_tables)
+            storage.ensure_schema(HISTORICAL_DATA, HISTORICAL_SCHEMA,
+                                  create_historical_tables)
 
         # Initialization starts here
         self.wowapi = wowapi(CLIENT_ID, CLIENT_SECRET,
                              retry_conn_failures=True)
+        self.instrumentation = Instrumentation(PROFILE_STAGES, TEMP_FOLDER)
+        self.auction_stream = AuctionStream(
+            CLIENT_ID, CLIENT_SECRET, f"{TEMP_FOLDER}/http_validators.json")
+        # Own auction ids (8.3 api changes), scanned while starting up
+        self.own_auctions = OwnAuctions(
+            cache_path=f"{TEMP_FOLDER}/own_auctions.json", background=True)
         self.realms = realm_objects_dict()
         self.items = item_objects_dict()
-        old_parsed_data = load_last_session()
-        self.auction_chunks = old_parsed_data[0]
-        self.seller_auction_chunks = old_parsed_data[1]
+        self.progress = PipelineProgress(REALMS)
+        self.checkpoints = CheckpointStore(f"{TEMP_FOLDER}/checkpoints")
+        migrate_last_session()
         create_output_databases()
-        # Own auction ids (8.3 api changes)
-        self.own_auctions_hash_table = OwnAuctions().ids
+        self.lua_export = None
+        if LUA_PATH:
+            self.lua_export = LuaExport(LUA_PATH, f"{TEMP_FOLDER}/lua",
+                                        LUA_MAX_PRICE_LEVELS)
+        # Every item in the items db is tracked, each with its outlier rule
+        self.outlier_rules = OutlierRules(
+            [item.item_id for item in self.items.values()], OUTLIER_RULES)
+        # Last parsed auctions of every realm, read when first needed
+        self.auction_chunks = LastSession(
+            self.checkpoints, {realm.name: realm.slug for realm in self.realms.values()},
+            self.outlier_rules.observe)
+
+    def price_ceilings(self, realm):
+        """Returns the realm's outlier price ceilings. The first call seeds
+        them with the realm's last session.
+        """
+        self.auction_chunks.get(realm.name)
+        return self.outlier_rules.price_ceilings(realm.name)
 
     def update_all(self, force_update=False):
         """Concurently update all realms with old data.\n
         Set 'force_update=True' to bypass update constraints. This will
-        update all realms, even those that are already up to date!
+        update all realms, even those that are already up to date!\n
+        At most 'max_downloads' dumps are downloaded at the same time (threads)
+        and at most 'max_parsers' are parsed at the same time (processes).
         """
-        processes = []
-        queue = Queue()  # process return values go here
+        self.resume_updates()
+        updated_realms = []  # Realm list for output writing
+        connected_realms = self.connected_realms()
 
-        # Start multiprocessing
         print(">> Starting concurent update...")
-        for realm in self.realms.values():
-            if force_update or self.check_for_update(realm):
-                process = Process(target=self.update_realm,
-                                  args=(realm, queue))
-                processes.append(process)
-                process.start()
-        # Join processes
-        for process in processes:
-            process.join()
-
-        # Deserialize data from finished worker processes
-        updated_realms = []  # Realm list for output writing
-        while not queue.empty():
-            realm = self.realms[queue.get()]
-            # Load subprocess data
-            with open(f"{TEMP_FOLDER}/{realm.slug}.pickle", 'rb') as file:
-                parsed_data = pickle.load(file)
-                self.auction_chunks[realm.name] = parsed_data[0]
-                self.seller_auction_chunks[realm.name] = parsed_data[1]
-            realm.update_db()  # update Realm's db record
-            updated_realms.append(realm)
+        with ThreadPoolExecutor(MAX_DOWNLOADS) as downloads, \
+                parser_pool(MAX_PARSERS) as parsers:
+            downloading = {downloads.submit(self.download_dump, realms, force_update): realms
+                           for realms in connected_realms.values()}
+            # Parse dumps as soon as their download finishes
+            parsing = {}
+            for future in as_completed(downloading):
+                realm = downloading[future][0]
+                try:
+                    path, stale_realms = future.result()
+                except Exception as err:
+                    print(f"> {realm.name} download failed: {err!r}")
+                    continue
+                if stale_realms:
+                    future = parsers.submit(parse_dump_to_file, path,
+                                            realm.name, realm.slug,
+                                            self.price_ceilings(realm))
+                    parsing[future] = stale_realms
+
+            # Collect parsed data from worker processes
+            for future in as_completed(parsing):
+                stale_realms = parsing[future]
+                try:
+                    columns_path, records = future.result()
+                except Exception as err:
+                    print(f"> {stale_realms[0].name} parsing failed: {err!r}")
+                    continue
+                self.instrumentation.extend(records)
+                self.load_parsed(stale_realms, columns_path)
+                updated_realms += stale_realms
 
-        self.write_output(updated_realms)
-        self.update_historical_db(updated_realms)
+        self.finish_updates(updated_realms)
+        self.flush_metrics()
         print("\nFinished concurent update!")
 
     def update_loop(self):
-        """Infinite update loop. No concurrent updates."""
-        # List of Realm objects, sorted by their expected next update timestamp
-        update_queue = [x for x in self.realms.values()]
-        update_queue.sort(key=lambda x: x.last_update + x.update_interval)
-
+        """Infinite update loop.\n
+        Realms are updated as soon as their next dump is expected, up to
+        'max_downloads' at the same time. Late dumps are retried with backoff.
+        """
         print("\n>> Starting update loop...")
-        while True:
-            sleep_ammount = None
-            next_update = None
-            for realm in update_queue:
-                time_delta = realm.last_update + \
-                    realm.update_interval - round(time.time())
-                # We only update 3 seconds after the anticipated next_update
-                # to avoid late updates from blizz and time.time() rounding
-                if time_delta >= -3:
-                    sleep_ammount = time_delta + 4
-                    next_update = realm
-                    break
-                elif time_delta < -3 and self.check_for_update(realm):
-                    parsed_data = self.update_realm(realm)
-                    self.auction_chunks[realm.name] = parsed_data[0]
-                    self.seller_auction_chunks[realm.name] = parsed_data[1]
-                    self.write_output([realm, ])
-                    self.update_historical_db([realm, ])
-                    realm.update_db()  # everything went well, update Realm's db record
-                    break  # Should this break even be here???
-                else:
-                    pass
-                    # TODO: do something with realms that dont have new data even if they should
-
-            # Resort the queue after breaking the loop
-            update_queue.sort(key=lambda x: x.last_update + x.update_interval)
-
-            if sleep_ammount:
-                sleep_time = time.strftime("%M:%S", time.gmtime(sleep_ammount))
-                print(f"\n> Next update: {next_update.name} in {sleep_time}.")
-                time.sleep(sleep_ammount)
+        self.resume_updates()
+        # One scheduled update per dump, its first realm standing for the
+        # realms connected to it
+        connected_realms = self.connected_realms()
+        with parser_pool(MAX_PARSERS) as parsers:
+            scheduler = UpdateScheduler(
+                [realms[0] for realms in connected_realms.values()],
+                lambda realm: self.scheduled_update(connected_realms[realm.url], parsers),
+                max_concurrent=MAX_DOWNLOADS)
+            scheduler.run()
+
+    def connected_realms(self):
+        """Connected realms share one dump, to fetch and parse once.
+        Returns {dump url: [realms]}.
+        """
+        connected_realms = {}
+        for realm in self.realms.values():
+            connected_realms.setdefault(realm.url, []).append(realm)
+        return connected_realms
 
-    def update_realm(self, realm, queue=None):
-        """Fetches the latest API json dump and parses it.\n
-        Multiprocessing Queue is None by default.
+    def scheduled_update(self, realms, parsers):
+        """Updates the connected 'realms' if their dump changed, parsing it
+        once in the 'parsers' pool. Returns True if they were updated.
         """
-        print(f"{realm.name} updating...")
-        conn = sqlite3.connect(f"{TEMP_FOLDER}/{realm.slug}.sqlite3")
-        c = conn.cursor()
+        realm = realms[0]
+        # An update that failed after its download is finished first: its
+        # dump wouldn't show as changed again
+        if self.resume_updates(realms):
+            return True
+        previous_updates = {stale_realm: stale_realm.last_update for stale_realm in realms}
+        path, stale_realms = self.download_dump(realms)
+        if not stale_realms:
+            return False  # dump not published yet
         try:
-            res = self.wowapi.get_resource(realm.url, 'eu')
-            auctions = res['auctions']
-        except ConnectionResetError as err:
-            print(err)
-
-        # Create or truncate table then dump json content in it
-        c.execute("""CREATE TABLE IF NOT EXISTS auctions (
-            id INTEGER,
-            item_id INTEGER,
-            quantity INTEGER,
-            unit_price INTEGER,
-            time_left TEXT)""")
-        c.execute("DELETE FROM auctions")
-
-        parsed_auctions = []
-        for auc in auctions:
-            if auc['item']['id'] == 168487:
-                # ignore auctions meant to just push up the mean price
-                if (auc['unit_price'] / 10000 > 300):
-                    continue
-                # add to pickle data
-                parsed_auctions.append({
-                    'id': auc['id'],
-                    'item_id': auc['item']['id'],
-                    'quantity': auc['quantity'],
-                    'price': auc['unit_price'] / 10000,
-                    'time_left': auc['time_left']
-                })
-                # Insert into db
-                values = (auc['id'], auc['item']['id'], auc['quantity'],
-                          auc['unit_price'], auc['time_left'])
-                c.execute("""INSERT INTO auctions (id, item_id, quantity, unit_price, time_left)
-                VALUES(?, ?, ?, ?, ?)""", values)
-        conn.commit()
-
-        print(f"> Finished updating: {realm.name}")
-
-        sorted_auctions = sorted(
-            parsed_auctions, key=lambda x: (x['price'], -x['id']))
-        parsed_data = (sorted_auctions, [])
-        if queue:
-            # If subprocess: serialize data and add realm name to queue
-            with open(f"{TEMP_FOLDER}/{realm.slug}.pickle", 'wb') as file:
-                pickle.dump(parsed_data, file)
-            queue.put(realm.name)
-        else:
-            return parsed_data
+            columns_path, records = parsers.submit(
+                parse_dump_to_file, path, realm.name, realm.slug,
+                self.price_ceilings(realm)).result()
+            self.instrumentation.extend(records)
+            for stale_realm in stale_realms:
+                # The scheduler learns the dump's cadence on the first realm
+                stale_realm.update_interval = realm.update_interval
+            self.load_parsed(stale_realms, columns_path)
+            self.finish_updates(stale_realms)
+        except Exception:
+            # The scheduler retries, resuming from the recorded progress.
+            # Until then the realms hold their previous snapshot
+            for stale_realm in stale_realms:
+                stale_realm.last_update = previous_updates[stale_realm]
+            raise
+        self.flush_metrics()
+        return True
+
+    def load_parsed(self, realms, columns_path):
+        """Makes the auctions parsed to 'columns_path' the last session of
+        'realms', which share one dump.
+        """
+        auctions = AuctionColumns.load(columns_path)
+        for realm in realms:
+            self.auction_chunks[realm.name] = auctions
+            self.outlier_rules.observe(realm.name, auctions)
+        self.progress.record(realms, 'parsed', columns_path)
+
+    def finish_updates(self, updated_realms, written_realms=()):
+        """Writes the outputs of realms whose new auctions are loaded,
+        recording every completed stage, then updates their db records.
+        'written_realms' only miss their historical data.
+        """
+        self.write_output(updated_realms)
+        self.progress.record(updated_realms, 'current_written')
+        realms = list(updated_realms) + list(written_realms)
+        self.update_historical_db(realms)
+        for realm in realms:
+            realm.update_db()  # everything went well, update Realm's db record
+        self.progress.record(realms, 'historical_written')
+
+    def resume_updates(self, realms=None):
+        """Finishes the updates of 'realms' (all realms if None) an earlier
+        run or attempt left halfway, each from its last completed stage (see
+        progress). Updates whose stage output is gone or unreadable are
+        forgotten, so they're done again from scratch.
+        Returns True if any update was finished.
+        """
+        names = self.realms if realms is None else {realm.name for realm in realms}
+        stages = {}  # (snapshot, stage, path): realms sharing a dump
+        for realm_name, (snapshot, stage, path) in self.progress.pending().items():
+            if realm_name in self.realms and realm_name in names:
+                stages.setdefault((snapshot, stage, path), []).append(
+                    self.realms[realm_name])
+        if not stages:
+            return False
+
+        print(f">> Resuming {sum(map(len, stages.values()))} interrupted updates...")
+        parsed_realms, written_realms = [], []
+        for (snapshot, stage, path), realms in stages.items():
+            previous_update = realms[0].last_update
+            for realm in realms:
+                realm.last_update = snapshot
+            try:
+                if stage == 'fetched':
+                    path, records = parse_dump_to_file(path, realms[0].name, realms[0].slug,
+                                                       self.price_ceilings(realms[0]))
+                    self.instrumentation.extend(records)
+                if stage == 'current_written':
+                    self.auction_chunks[realms[0].name]  # the update's checkpoint
+                    written_realms += realms
+                else:
+                    self.load_parsed(realms, path)
+                    parsed_realms += realms
+            except (OSError, KeyError, ValueError) as err:
+                print(f"> {realms[0].name} can't resume, updating again: {err!r}")
+                self.progress.forget(realms)
+                for realm in realms:
+                    realm.last_update = previous_update
+
+        self.finish_updates(parsed_realms, written_realms)
+        self.flush_metrics()
+        print("> Resumed interrupted updates")
+        return bool(parsed_realms or written_realms)
+
+    def update_realm(self, realm):
+        """Fetches the latest API json dump and parses it.\n
+        Nothing is written, so the update isn't left pending for
+        resume_updates.
+        """
+        path = self.download_dump([realm])[0]
+        self.progress.forget([realm])
+        return parse_dump(path, realm.name, realm.slug,
+                          self.price_ceilings(realm),
+                          self.instrumentation)
+
+    def flush_metrics(self):
+        """Exports the stage records collected since the last flush."""
+        self.instrumentation.flush(METRICS_JSONL, METRICS_PROMETHEUS)
+
+    def dump_path(self, realm):
+        """Connected realms share their dump's file."""
+        return f"{TEMP_FOLDER}/{realm.connected_realm_id}.json"
+
+    def download_dump(self, realms, force_update=False):
+        """Downloads the latest json dump of 'realms', which must all belong
+        to the same connected realm, to TEMP_FOLDER.\n
+        The request is conditional, so a dump that didn't change since the
+        last download isn't transferred again.
+        Returns (dump path, realms whose data is older than the dump).
+        Set 'force_update=True' to return all of them regardless.
+        """
+        path = self.dump_path(realms[0])
+        with self.instrumentation.stage(realms[0].name, 'download') as stage:
+            last_update, stage['bytes'] = self.auction_stream.download(
+                realms[0].url, 'eu', path, conditional=not force_update)
+
+        stale_realms = []
+        for realm in realms:
+            realm.last_check = round(time.time())
+            if force_update or realm.last_update != last_update:
+                # Update realm's attribute in the db only after updating is done
+                realm.last_update = last_update
+                stale_realms.append(realm)
+        self.progress.record(stale_realms, 'fetched', path)
+        return (path, stale_realms)
 
     def __update_realm_old(self, realm, queue=None):
         """Fetches the latest API json dump and parses it.\n
@@ -372,110 +620,104 @@ class DataParser:
         else:
             return parsed_data
 
-    def check_for_update(self, realm):
-        """Checks for new json dump and returns True if an update is needed.\n
-        Updates Realm instance's 'last_update' field but not in the source file.
-        """
-        headers = self.wowapi.get_auctions(
-            'eu', realm.slug, locale='en_US')['files'][0]
-        last_update = headers['lastModified'] // 1000
-        realm.last_check = round(time.time())
-
-        if realm.last_update and realm.last_update == last_update:
-            return False  # update not available
-
-        # Update realm's attribute in the db only after updating is done
-        realm.last_update = last_update
-        return True  # update available
-
     def write_output(self, updated_realms):
         """Updates model with up to date parsed data.\n
-        Serializes parsed data in memory for later use.\n
+        Checkpoints every updated realm's parsed data for later use.\n
+        Summarizes every updated realm's market per item (see market).\n
         Encodes data in Lua Table format for Multiboxer(WoW addon).
         """
-        with open(f"{TEMP_FOLDER}/_serialized_data.pickle", 'wb') as file:
-            pickle.dump(
-                (self.auction_chunks, self.seller_auction_chunks), file)
-        conn = sqlite3.connect(CURRENT_DATA)
-        c = conn.cursor()
-
+        # Pick up auctions posted since the last update
+        self.own_auctions.refresh()
+        lua_changed = False
         # Update auction_chunks table with new data from updated_realms
         for realm in updated_realms:
-            c.execute("DELETE FROM auction_chunks WHERE realm = ?",
-                      (realm.name, ))
-            # concatenate auctions with same price (except own auctions)
             auctions = self.auction_chunks[realm.name]
-            concatenated_auctions = []
-            for i in range(0, len(auctions)):
-                auc = auctions[i]
-                auc['own'] = 1 if self.own_auctions_hash_table.get(
-                    realm.name, {}).get(auc['id'], None) else 0
-                if (i == 0
-                        or auc['price'] != concatenated_auctions[-1]['price']
-                        or auc['own'] != concatenated_auctions[-1]['own']):
-                    concatenated_auctions.append(auc)
+            with self.instrumentation.stage(realm.name, 'checkpoint') as stage:
+                self.checkpoints.save(realm.slug, auctions)
+                stage['records_in'] = len(auctions)
+
+            with self.instrumentation.stage(realm.name, 'concatenate') as stage:
+                # concatenate auctions with same price (except own auctions)
+                concatenated_auctions = concatenate_chunks(
+                    auctions, self.own_auctions.ids.get(realm.name, {}))
+                stage['records_in'] = len(auctions)
+                stage['records_out'] = len(concatenated_auctions)
+
+            with self.instrumentation.stage(realm.name, 'market_summary') as stage:
+                summaries = market.summarize(concatenated_auctions)
+                stage['records_in'] = len(concatenated_auctions)
+                stage['records_out'] = len(summaries)
+
+            with self.instrumentation.stage(realm.name, 'write_current') as stage, \
+                    storage.transaction(CURRENT_DATA) as c:
+                stage['records_in'] = len(concatenated_auctions)
+                if INCREMENTAL_OUTPUT:
+                    c.execute("""SELECT chunk_id, item_id, price, stack_size, time_left, own
+                            FROM auction_chunks WHERE realm = ?""", (realm.name, ))
+                    inserts, updates, deletes = diff_chunks(
+                        c.fetchall(), concatenated_auctions)
                 else:
-                    concatenated_auctions[-1]['quantity'] = concatenated_auctions[-1]['quantity'] + auc['quantity']
-
-            for auc in concatenated_auctions:
-                values = (realm.name,
-                          auc['item_id'],
-                          1,
-                          auc['price'],
-                          auc['quantity'],
-                          auc['time_left'],
-                          auc['own']
-                          )
-                c.execute("""INSERT INTO auction_chunks
+                    c.execute("DELETE FROM auction_chunks WHERE realm = ?",
+                              (realm.name, ))
+                    inserts, updates, deletes = concatenated_auctions, [], []
+
+                c.executemany("DELETE FROM auction_chunks WHERE chunk_id = ?",
+                              ((chunk_id, ) for chunk_id in deletes))
+                c.executemany("""UPDATE auction_chunks SET stack_size = ?, time_left = ?
+                        WHERE chunk_id = ?""", updates)
+                c.executemany("""INSERT INTO auction_chunks
                         (realm, item_id, quantity, price, stack_size, time_left, own)
-                        VALUES(?, ?, ?, ?, ?, ?, ?)""", values)
-        conn.commit()
-        conn.close()
-
-    def update_historical_db(self, updated_realms):
-        """Updates Historical database with data from the lastest realm snapshots."""
-
-        conn = sqlite3.connect(HISTORICAL_DATA)
-        c = conn.cursor()
+                        VALUES(?, ?, ?, ?, ?, ?, ?)""",
+                              ((realm.name, item_id, 1, price, quantity, time_left, own)
+                               for item_id, price, quantity, time_left, own in inserts))
+                # Written with the chunks so readers never see them disagree
+                market.write_realm(c, realm.name, realm.last_update, summaries)
+                stage['records_out'] = len(inserts) + len(updates) + len(deletes)
+
+            if self.lua_export:
+                with self.instrumentation.stage(realm.name, 'lua_fragment') as stage:
+                    lua_changed |= self.lua_export.update_realm(
+                        realm.name, realm.slug, concatenated_auctions)
+                    stage['records_in'] = len(concatenated_auctions)
+
+        # Rebuild the addon's file only if a realm's prices changed
+        if lua_changed or (self.lua_export and not os.path.exists(LUA_PATH)):
+            with self.instrumentation.stage('all', 'lua_export') as stage:
+                self.lua_export.write(sorted(realm.slug for realm in self.realms.values()))
+                stage['bytes'] = os.path.getsize(LUA_PATH)
+
+    def update_historical_db(self, updated_realms, prune=True):
+        """Updates Historical database with data from the lastest realm snapshots.\n
+        Diffs every snapshot with the realm's previous one into chunk events
+        (see history.add_snapshot), folds it into the price rollups and, if
+        'prune', prunes raw snapshot data older than 'raw_retention_days'.
+        """
 
         for realm in updated_realms:
             snapshot_timestamp = realm.last_update
-            c.execute("SELECT * FROM snapshots WHERE timestamp=? AND realm=?",
-                      (snapshot_timestamp, realm.name))
-            if len(c.fetchall()):
+            if storage.query(HISTORICAL_DATA,
+                             "SELECT * FROM snapshots WHERE timestamp=? AND realm=?",
+                             (snapshot_timestamp, realm.name)):
                 continue
-            c.execute("""INSERT INTO snapshots(timestamp, realm)
-                    VALUES(?, ?)""", (snapshot_timestamp, realm.name))
-            snapshot_id = c.lastrowid
-
-            for chunk in self.seller_auction_chunks[realm.name]:
-                c.execute("SELECT chunk_id FROM auctions WHERE auc_id=?",
-                          (chunk['auc_ids'][0], ))
-                chunk_id = c.fetchone()[0] if c.fetchone() else None
-                if chunk_id:
-                    for auc_id in chunk['auc_ids']:
-                        c.execute("UPDATE auctions SET last_seen=? WHERE auc_id=? AND chunk_id=?",
-                                  (snapshot_timestamp, auc_id, chunk_id))
-                else:
-                    # put data in
-                    c.execute("""INSERT INTO chunks(first_seen, item_id, price, stack_size, time_left)
-                            VALUES(?, ?, ?, ?, ?)""",
-                              (snapshot_timestamp,
-                               chunk['item_id'],
-                               chunk['price'],
-                               chunk['stack_size'],
-                               chunk['time_left']))
-                    chunk_id = c.lastrowid
-                    for auc_id in chunk['auc_ids']:
-                        c.execute("""INSERT INTO auctions(auc_id, chunk_id, last_seen)
-                                VALUES(?, ?, ?)""", (auc_id, chunk_id, snapshot_timestamp))
-
-                # Add relation between chunk and snapshot
-                c.execute("""INSERT INTO snapshot_chunk_events(snapshot_id, chunk_id)
-                        VALUES(?, ?)""", (snapshot_id, chunk_id))
 
-        conn.commit()
-        conn.close()
+            # One transaction per realm snapshot
+            with self.instrumentation.stage(realm.name, 'write_historical') as stage, \
+                    storage.transaction(HISTORICAL_DATA) as c:
+                auctions = self.auction_chunks[realm.name]
+                stage['records_in'] = len(auctions)
+                stage['records_out'] = history.add_snapshot(
+                    c, realm.name, snapshot_timestamp, auctions)
+                rollups.add_snapshot(c, realm.name, snapshot_timestamp, auctions)
+
+        if prune:
+            self.prune_historical_db()
+
+    def prune_historical_db(self):
+        """Prunes raw snapshot data older than 'raw_retention_days', if set."""
+        if RAW_RETENTION_DAYS:
+            with self.instrumentation.stage('all', 'prune'), \
+                    storage.transaction(HISTORICAL_DATA) as c:
+                rollups.prune_raw(c, time.time() - RAW_RETENTION_DAYS * 86400)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,169 @@
+import gzip
+import io
+import json
+import os
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+TOKEN_URL = 'https://{region}.battle.net/oauth/token'
+API_URL = 'https://{region}.api.blizzard.com/{resource}'
+CHUNK_SIZE = 1 << 20  # characters read from the response body at a time
+
+AUCTIONS_KEY = re.compile(r'"auctions"\s*:\s*\[')
+SEPARATORS = re.compile(r'[\s,]*')
+decoder = json.JSONDecoder()
+
+
+def item_filter(item_ids):
+    """Returns an auction filter that keeps only auctions of 'item_ids'."""
+    item_ids = frozenset(item_ids)
+    return lambda auc: auc['item']['id'] in item_ids
+
+
+def open_dump(path):
+    """Opens a json dump as text, decompressing archived '.gz' and '.zst'
+    dumps as they're read. '.zst' needs the zstandard package.
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.zst'):
+        import zstandard
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True),
+            encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_auctions(body, auction_filter=None, chunk_size=CHUNK_SIZE):
+    """Yields auctions from an Auction API json body one at a time.\n
+    'body' is a text file-like object. Every auction object is decoded on its
+    own as the body streams past, so only the auctions kept by
+    'auction_filter' are ever held in memory.
+    """
+    buffer = ''
+    match = None
+    while not match:
+        chunk = body.read(chunk_size)
+        if not chunk:
+            return  # no auctions in this dump
+        buffer += chunk
+        match = AUCTIONS_KEY.search(buffer)
+
+    pos = match.end()
+    while True:
+        pos = SEPARATORS.match(buffer, pos).end()
+        if buffer.startswith(']', pos):
+            return
+        try:
+            auction, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            # Auction object cut at the end of the buffer: read some more
+            chunk = body.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if auction_filter is None or auction_filter(auction):
+            yield auction
+
+
+def http_timestamp(date):
+    """Returns an HTTP date header as a unix timestamp."""
+    return round(parsedate_to_datetime(date).timestamp()) if date else None
+
+
+class AuctionStream:
+    """Opens Blizzard API resources as streamed response bodies instead of
+    decoding them whole like wowapi does.\n
+    Downloads are conditional: the ETag and Last-Modified of every url are
+    kept in 'validators_path', so unchanged dumps come back as 304s. The
+    timestamp of every url's last download is kept along with them.
+    'api_url' and 'token_url' can point to a local stub server.
+    """
+
+    def __init__(self, client_id, client_secret, validators_path=None,
+                 api_url=API_URL, token_url=TOKEN_URL):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url
+        self.token_url = token_url
+        self.session = requests.Session()
+        self.tokens = {}  # region: (access_token, expiration timestamp)
+        self.validators_path = validators_path
+        self.validators = {}  # url: {'etag': ..., 'last_modified': ..., 'timestamp': ...}
+        self.validators_lock = threading.Lock()
+        if validators_path and os.path.exists(validators_path):
+            with open(validators_path) as file:
+                self.validators = json.load(file)
+
+    def access_token(self, region):
+        """Returns a cached client credentials token for 'region'."""
+        token = self.tokens.get(region)
+        if token and token[1] > time.time():
+            return token[0]
+
+        res = self.session.post(self.token_url.format(region=region),
+                                data={'grant_type': 'client_credentials'},
+                                auth=(self.client_id, self.client_secret))
+        res.raise_for_status()
+        data = res.json()
+        # Renew the token a minute before it actually expires
+        self.tokens[region] = (data['access_token'],
+                               time.time() + data['expires_in'] - 60)
+        return data['access_token']
+
+    def download(self, resource, region, path, conditional=True):
+        """Streams the resource's body to 'path' without decoding the json.\n
+        If 'conditional' and 'path' already holds a previous download, the
+        request is conditional and the file is left as is when the resource
+        hasn't changed.\n
+        Returns (timestamp of the file's content, bytes transferred). The
+        timestamp is the Last-Modified date or, if the server doesn't send
+        one, the time of the download, so an unchanged resource keeps the
+        timestamp of the download it matches.
+        """
+        url = self.api_url.format(region=region, resource=resource)
+        headers = {'Authorization': f"Bearer {self.access_token(region)}"}
+        validators = self.validators.get(url, {})
+        if conditional and os.path.exists(path):
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+
+        with self.session.get(url, headers=headers, stream=True) as res:
+            if res.status_code == 304:
+                if not validators.get('timestamp'):  # saved by an older version
+                    validators = dict(validators, timestamp=(
+                        http_timestamp(validators.get('last_modified'))
+                        or round(time.time())))
+                    self.save_validators(url, validators)
+                return (validators['timestamp'], 0)
+            res.raise_for_status()
+            # Connected realms updated at the same time share 'path'
+            part_path = f"{path}.{threading.get_ident()}.part"
+            size = 0
+            with open(part_path, 'wb') as file:
+                for chunk in res.iter_content(CHUNK_SIZE):
+                    size += file.write(chunk)
+            validators = {'etag': res.headers.get('ETag'),
+                          'last_modified': res.headers.get('Last-Modified')}
+        validators['timestamp'] = (http_timestamp(validators['last_modified'])
+                                   or round(time.time()))
+        os.replace(part_path, path)
+        self.save_validators(url, validators)
+        return (validators['timestamp'], size)
+
+    def save_validators(self, url, validators):
+        with self.validators_lock:
+            self.validators[url] = validators
+            if not self.validators_path:
+                return
+            with open(f"{self.validators_path}.part", 'w') as file:
+                json.dump(self.validators, file)
+            os.replace(f"{self.validators_path}.part", self.validators_path)
@@ -0,0 +1,50 @@
+"""Times the pure Python and NumPy engines at 10k/100k/1M auctions.
+tests/test_engines.py checks that they return the same auction_chunks rows.
+
+    python -m benchmarks.bench_engines [n_auctions ...]
+"""
+import random
+import sys
+import time
+
+import auction_columns
+import numpy_engine
+from auction_columns import AuctionColumns
+from benchmarks.synthetic import generate_auctions
+
+ENGINES = (('python', auction_columns), ('numpy', numpy_engine))
+
+
+def raw_auctions(n_auctions):
+    auctions = AuctionColumns()
+    for auc in generate_auctions(n_auctions, tracked_share=0.5):
+        # a few hundred items, with coarse prices so many auctions share a
+        # price level
+        item_id = auc['item']['id'] % 400
+        unit_price = auc.get('unit_price', auc.get('buyout')) // 10000 * 10000
+        auctions.append(auc['id'], item_id, auc['quantity'],
+                        unit_price / 10000, auc['time_left'])
+    return auctions
+
+
+def run(engine, auctions, own_ids):
+    # track 300 of the items, half of them with a price ceiling
+    price_ceilings = {item_id: 300 if item_id % 2 else float('inf')
+                      for item_id in range(300)}
+    start = time.perf_counter()
+    parsed = engine.filter_sorted(auctions, price_ceilings)
+    chunks = engine.concatenate_chunks(parsed, own_ids)
+    return time.perf_counter() - start, chunks
+
+
+if __name__ == '__main__':
+    sizes = [int(x) for x in sys.argv[1:]] or [10000, 100000, 1000000]
+    for n_auctions in sizes:
+        auctions = raw_auctions(n_auctions)
+        own_ids = dict.fromkeys(random.Random(1).sample(
+            list(auctions.ids), len(auctions) // 20), True)
+        results = {name: run(engine, auctions, own_ids)
+                   for name, engine in ENGINES}
+        print(f">> {n_auctions} auctions, {len(results['python'][1])} chunks")
+        for name, (seconds, _) in results.items():
+            print(f"{name:>8}: {seconds * 1000:9.1f} ms")
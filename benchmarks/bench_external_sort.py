@@ -0,0 +1,53 @@
+"""Times ExternalSorter sorting in memory and spilling runs to disk, with
+both engines, and reports their peak traced memory.
+tests/test_external_sort.py checks that both ways give the same auctions.
+
+    python -m benchmarks.bench_external_sort [n_auctions] [n_runs]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from auction_columns import TIME_LEFT
+from benchmarks.bench_engines import ENGINES, raw_auctions
+from external_sort import SORT_BYTES_PER_AUCTION, ExternalSorter
+
+
+def sort(engine, rows, price_ceilings, folder, memory_budget, traced=False):
+    """Returns (sorted auctions, runs spilled, seconds or peak traced bytes)."""
+    sorter = ExternalSorter(folder, price_ceilings, memory_budget, engine.filter_sorted)
+    if traced:
+        tracemalloc.start()
+    start = time.perf_counter()
+    for row in rows:
+        sorter.append(*row)
+    parsed = sorter.sorted()
+    measured = time.perf_counter() - start
+    if traced:
+        measured = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return parsed, len(sorter.runs), measured
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    n_runs = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    auctions = raw_auctions(n_auctions)
+    price_ceilings = {item_id: 300 if item_id % 2 else float('inf')
+                      for item_id in range(300)}
+    rows = list(zip(auctions.ids, auctions.item_ids, auctions.quantities,
+                    auctions.prices, (TIME_LEFT[code] for code in auctions.time_left)))
+    budget = n_auctions // n_runs * SORT_BYTES_PER_AUCTION + 1
+
+    print(f">> {n_auctions} auctions, {n_runs} runs")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, engine in ENGINES:
+            for way, memory_budget in (('in memory', 0), ('on disk', budget)):
+                folder = os.path.join(tmp, name)
+                _, runs, elapsed = sort(engine, rows, price_ceilings, folder, memory_budget)
+                peak = sort(engine, rows, price_ceilings, folder, memory_budget, True)[2]
+                print(f"{name:>6} {way:>9}: {elapsed * 1000:8.1f} ms  "
+                      f"peak {peak / (1 << 20):7.1f} MB  {runs} runs")
+
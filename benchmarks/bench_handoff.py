@@ -0,0 +1,57 @@
+"""Compares handing a realm's parsed auctions from a worker to the parent as
+pickled dicts with handing them over as an AuctionColumns file.
+
+    python -m benchmarks.bench_handoff [auctions_per_realm]
+"""
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from auction_columns import AuctionColumns, filter_sorted
+from benchmarks.synthetic import TRACKED_ITEM, generate_auctions
+
+
+def parsed_auctions(n_auctions):
+    auctions = AuctionColumns()
+    for auc in generate_auctions(n_auctions, tracked_share=1):
+        auctions.append(auc['id'], auc['item']['id'], auc['quantity'],
+                        auc['unit_price'] / 10000, auc['time_left'])
+    return filter_sorted(auctions, {TRACKED_ITEM: float('inf')})
+
+
+def as_dicts(auctions):
+    return [{'id': auctions.ids[i],
+             'item_id': auctions.item_ids[i],
+             'quantity': auctions.quantities[i],
+             'price': auctions.prices[i],
+             'time_left': auctions.time_left[i]} for i in range(len(auctions))]
+
+
+def handoff_pickle(auctions, path):
+    with open(path, 'wb') as file:
+        pickle.dump(as_dicts(auctions), file)
+    with open(path, 'rb') as file:
+        pickle.load(file)
+
+
+def handoff_columns(auctions, path):
+    auctions.save(path)
+    AuctionColumns.load(path)
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    auctions = parsed_auctions(n_auctions)
+    print(f">> {n_auctions} auctions per realm")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'handoff')
+        for name, handoff in (('pickle', handoff_pickle),
+                              ('columns', handoff_columns)):
+            start = time.perf_counter()
+            handoff(auctions, path)
+            seconds = time.perf_counter() - start
+            size = os.path.getsize(path)
+            print(f"{name:>8}: {seconds * 1000:8.1f} ms  {size / 1024:9.1f} KB  "
+                  f"({size / n_auctions:.1f} bytes/auction)")
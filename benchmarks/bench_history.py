@@ -0,0 +1,109 @@
+"""Fills a historical db with 6 months of synthetic hourly snapshots through
+DataParser.update_historical_db and reports insert latency and the query
+latency of raw snapshots, sales and rollups.
+
+    python -m benchmarks.bench_history [auctions_per_snapshot]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import auction_data
+import history
+import rollups
+import storage
+from auction_columns import AuctionColumns, filter_sorted
+from benchmarks.synthetic import TIME_LEFT, TRACKED_ITEM
+from instrumentation import Instrumentation
+
+HOUR = 3600
+SNAPSHOTS = 24 * 182  # 6 months of hourly snapshots
+ITEMS = (TRACKED_ITEM, 168486, 168488, 168489)
+
+
+def next_snapshot(rng, previous, n_auctions, next_auc_id):
+    """Keeps most of the previous snapshot's auctions, some of them partly
+    bought out, and lists new ones. Auctions are (id, item_id, quantity,
+    price, time_left) tuples.
+    """
+    auctions = []
+    for auction in previous:
+        if rng.random() < 0.7:
+            if rng.random() < 0.1:
+                auction = auction[:2] + (max(auction[2] - rng.randint(1, 50), 1), ) \
+                    + auction[3:]
+            auctions.append(auction)
+    while len(auctions) < n_auctions:
+        auctions.append((next_auc_id, rng.choice(ITEMS), rng.randint(1, 200),
+                         rng.randint(5000, 30000) / 100, rng.choice(TIME_LEFT)))
+        next_auc_id += 1
+    return auctions, next_auc_id
+
+
+def snapshot_auctions(auctions):
+    columns = AuctionColumns()
+    for auction in auctions:
+        columns.append(*auction)
+    return filter_sorted(columns, dict.fromkeys(ITEMS, float('inf')))
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return {p: latencies[int(p / 100 * (len(latencies) - 1))] * 1000
+            for p in (50, 90, 99)}
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'historical.sqlite3')
+        auction_data.HISTORICAL_DATA = history.HISTORICAL_DATA = path
+        rollups.HISTORICAL_DATA = path
+        auction_data.RAW_RETENTION_DAYS = 0  # synthetic snapshots are old
+        with storage.transaction(path) as c:
+            history.create_tables(c)
+            rollups.create_tables(c)
+
+        realm = SimpleNamespace(name='Benchmark', last_update=0)
+        parser = SimpleNamespace(auction_chunks={}, instrumentation=Instrumentation())
+        auctions, next_auc_id = [], 1
+        insert_latencies = []
+        start = 1570000000
+        for hour in range(SNAPSHOTS):
+            auctions, next_auc_id = next_snapshot(rng, auctions, n_auctions, next_auc_id)
+            parser.auction_chunks[realm.name] = snapshot_auctions(auctions)
+            realm.last_update = start + hour * HOUR
+            began = time.perf_counter()
+            auction_data.DataParser.update_historical_db(parser, [realm], prune=False)
+            insert_latencies.append(time.perf_counter() - began)
+
+        def query_latencies(query, *args):
+            latencies = []
+            for _ in range(100):
+                began = time.perf_counter()
+                query(realm.name, TRACKED_ITEM, *args)
+                latencies.append(time.perf_counter() - began)
+            return latencies
+
+        end = start + SNAPSHOTS * HOUR
+        week = start + rng.randrange(SNAPSHOTS) * HOUR
+        latencies = {
+            'insert': insert_latencies,
+            'raw week': query_latencies(history.price_history, week, week + 7 * 24 * HOUR),
+            'raw 6 mon': query_latencies(history.price_history, start, end),
+            'sales week': query_latencies(history.sales, week, week + 7 * 24 * HOUR),
+            'daily 6 mon': query_latencies(rollups.rollup_history, 'day', start, end),
+        }
+
+        size_mb = os.path.getsize(path) / (1 << 20)
+        print(f">> {SNAPSHOTS} snapshots x {n_auctions} auctions, {size_mb:.1f} MB db")
+        for name, latencies in latencies.items():
+            p = percentiles(latencies)
+            print(f"{name:>11}: mean {statistics.mean(latencies) * 1000:6.2f} ms  "
+                  f"p50 {p[50]:6.2f}  p90 {p[90]:6.2f}  p99 {p[99]:6.2f} ms")
+        storage.close_all()
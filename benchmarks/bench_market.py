@@ -0,0 +1,95 @@
+"""Checks market summaries written by write_output against ad hoc queries on
+auction_chunks, then times a page load of item reads both ways: ad hoc
+queries, and the market module cold and warm.
+
+    python -m benchmarks.bench_market [n_auctions] [n_reads]
+"""
+import random
+import sys
+import tempfile
+import time
+
+import market
+import storage
+from auction_columns import filter_sorted
+from benchmarks.bench_engines import raw_auctions
+from benchmarks.bench_pipeline import stub_parser
+from benchmarks.stub_api import StubApi
+
+ITEMS = range(300)
+
+
+def ad_hoc(realm_name, item_id, price):
+    """What MyAH computes per item page load without market_summary."""
+    min_price, quantity, own_quantity = storage.query(
+        market.CURRENT_DATA,
+        """SELECT MIN(price), SUM(stack_size), SUM(stack_size * own)
+        FROM auction_chunks WHERE realm = ? AND item_id = ?""", (realm_name, item_id))[0]
+    own_min_price = storage.query(
+        market.CURRENT_DATA,
+        """SELECT MIN(price) FROM auction_chunks
+        WHERE realm = ? AND item_id = ? AND own""", (realm_name, item_id))[0][0]
+    undercut_quantity = None
+    if own_min_price is not None:
+        undercut_quantity = storage.query(
+            market.CURRENT_DATA,
+            """SELECT COALESCE(SUM(stack_size), 0) FROM auction_chunks
+            WHERE realm = ? AND item_id = ? AND price < ? AND NOT own""",
+            (realm_name, item_id, own_min_price))[0][0]
+    below = storage.query(
+        market.CURRENT_DATA,
+        """SELECT COALESCE(SUM(stack_size), 0) FROM auction_chunks
+        WHERE realm = ? AND item_id = ? AND price < ?""", (realm_name, item_id, price))[0][0]
+    return min_price, quantity, own_quantity, own_min_price, undercut_quantity, below
+
+
+def cached(realm_name, item_id, price):
+    summary = market.item_summary(realm_name, item_id)
+    return (summary['min_price'], summary['quantity'], summary['own_quantity'],
+            summary['own_min_price'], summary['undercut_quantity'],
+            market.volume_below(realm_name, item_id, price))
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_reads = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    auctions = raw_auctions(n_auctions)
+    own_ids = dict.fromkeys(auctions.ids[::40], True)
+    rng = random.Random(0)
+    reads = [(rng.choice(ITEMS), rng.randint(50, 300)) for _ in range(n_reads)]
+
+    with tempfile.TemporaryDirectory() as tmp, StubApi({}) as api:
+        parser = stub_parser(tmp, api)
+        realm = parser.realms['Benchmark']
+        realm.last_update = 1
+        parser.own_auctions.ids = {realm.name: own_ids}
+        parser.own_auctions.refresh = lambda: None
+        parser.auction_chunks[realm.name] = filter_sorted(
+            auctions, {item_id: float('inf') for item_id in ITEMS})
+        began = time.perf_counter()
+        parser.write_output([realm])
+        print(f">> {n_auctions} auctions, {len(ITEMS)} items, write_output "
+              f"{(time.perf_counter() - began) * 1000:.1f} ms")
+
+        for item_id in ITEMS:
+            expected = ad_hoc(realm.name, item_id, 150)
+            assert cached(realm.name, item_id, 150) == expected, item_id
+        print("> Summaries match ad hoc queries")
+
+        for name, read in (('ad hoc', ad_hoc), ('cold cache', cached),
+                           ('warm cache', cached)):
+            if name == 'cold cache':
+                market.cache_clear()
+            began = time.perf_counter()
+            for item_id, price in reads:
+                read(realm.name, item_id, price)
+            elapsed = time.perf_counter() - began
+            print(f"{name:>12}: {elapsed / n_reads * 1e6:8.1f} us/read")
+
+        # A newer snapshot invalidates the realm's cached reads
+        parser.own_auctions.ids = {}
+        realm.last_update = 2
+        parser.write_output([realm])
+        assert market.item_summary(realm.name, 1)['own_min_price'] is None
+        print("> New last_update invalidated the cache")
+        storage.close_all()
@@ -0,0 +1,56 @@
+"""Measures the memory held by a realm's parsed auctions as one dict per
+auction (the original format), as Auction records and as AuctionColumns, and
+by a realm's sellers as a {name: True} dict and as a tuple.
+
+    python -m benchmarks.bench_memory [n_auctions] [n_sellers]
+"""
+import sys
+import tracemalloc
+
+from auction_columns import TIME_LEFT_CODES, Auction, AuctionColumns
+from benchmarks.synthetic import generate_auctions
+
+
+def allocated(build):
+    """Returns the bytes still allocated by what 'build()' returns."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def columns(rows):
+    auctions = AuctionColumns()
+    for row in rows:
+        auctions.append(*row)
+    return auctions
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    n_sellers = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    # All commodities, so every auction has a unit_price
+    rows = [(auc['id'], auc['item']['id'], auc['quantity'],
+             auc['unit_price'] / 10000, auc['time_left'])
+            for auc in generate_auctions(n_auctions, tracked_share=1)]
+    sellers = [f"Seller{i}-Realm" for i in range(n_sellers)]
+
+    print(f">> {n_auctions} auctions")
+    for name, build in (
+            ('dicts', lambda: [
+                {'id': auc_id, 'item_id': item_id, 'quantity': quantity,
+                 'price': price, 'time_left': time_left}
+                for auc_id, item_id, quantity, price, time_left in rows]),
+            ('Auction', lambda: [
+                Auction(*row[:4], TIME_LEFT_CODES[row[4]]) for row in rows]),
+            ('AuctionColumns', lambda: columns(rows))):
+        size = allocated(build)
+        print(f"{name:>15}: {size / (1 << 20):8.1f} MB  {size / n_auctions:6.1f} B/auction")
+
+    print(f">> {n_sellers} sellers")
+    for name, build in (('dict', lambda: {seller: True for seller in sellers}),
+                        ('tuple', lambda: tuple(sellers))):
+        size = allocated(build)
+        print(f"{name:>15}: {size / 1024:8.1f} KB")
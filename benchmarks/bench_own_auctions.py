@@ -0,0 +1,91 @@
+"""Checks that own_auctions.scan_auction_ids finds the same ids as decoding
+a synthetic Multiboxer_Data.lua with slpp, then times both and a refresh of
+an unchanged file.
+
+    python -m benchmarks.bench_own_auctions [auctions_per_character]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from slpp import slpp as lua
+
+from own_auctions import OwnAuctions, scan_auction_ids
+
+STRING_TO_REMOVE = "Multiboxer_DataDB = "
+REALMS = ('Argent Dawn', 'Kazzak', "Twisting Nether", 'Draenor')
+CHARACTERS = 10
+
+
+def write_saved_variables(path, n_auctions, seed=0):
+    """Writes SavedVariables the way WoW does, with auction ids stored both
+    as lists and as [auc_id] = true entries, next to bulkier addon data.
+    """
+    rng = random.Random(seed)
+    lines = ["Multiboxer_DataDB = {", '\t["realmData"] = {']
+    for realm_name in REALMS:
+        lines += [f'\t\t["{realm_name}"] = {{', '\t\t\t["auctionIds"] = {']
+        for character in range(CHARACTERS):
+            lines.append(f'\t\t\t\t["Char{character}-{realm_name}"] = {{')
+            for i in range(n_auctions):
+                auc_id = rng.randint(1, 2 ** 31)
+                if character % 2:
+                    lines.append(f'\t\t\t\t\t[{auc_id}] = true,')
+                else:
+                    lines.append(f'\t\t\t\t\t{auc_id}, -- [{i + 1}]')
+            lines.append('\t\t\t\t},')
+        lines += ['\t\t\t},', '\t\t\t["scans"] = {']
+        for _ in range(n_auctions * CHARACTERS):
+            lines += ['\t\t\t\t{', f'\t\t\t\t\t["price"] = {rng.random() * 100},',
+                      f'\t\t\t\t\t["seller"] = "Seller{rng.randint(1, 999)}",', '\t\t\t\t},']
+        lines += ['\t\t\t},', '\t\t},']
+    lines += ['\t},', '}']
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def slpp_auction_ids(text):
+    data = lua.decode(text.replace(STRING_TO_REMOVE, ''))
+    ids = {}
+    for realm_name, realm in data['realmData'].items():
+        for char_auctions in realm.get('auctionIds', {}).values():
+            if isinstance(char_auctions, dict):
+                char_auctions = [auc_id if value is True else value
+                                 for auc_id, value in char_auctions.items()]
+            ids.setdefault(realm_name, set()).update(char_auctions)
+    return ids
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'Multiboxer_Data.lua')
+        write_saved_variables(path, n_auctions)
+        with open(path, encoding='utf-8') as file:
+            text = file.read()
+        size_mb = os.path.getsize(path) / (1 << 20)
+
+        slpp_seconds, expected = timed(slpp_auction_ids, text)
+        scan_seconds, ids = timed(scan_auction_ids, text)
+        assert ids == expected, 'scanner and slpp differ'
+        load_seconds, own_auctions = timed(
+            OwnAuctions, [path], os.path.join(tmp, 'cache.json'))
+        refresh_seconds, changed = timed(own_auctions.refresh)
+        assert not changed
+        cached_seconds, _ = timed(
+            OwnAuctions, [path], os.path.join(tmp, 'cache.json'))
+
+        print(f">> {sum(map(len, ids.values()))} own auctions, {size_mb:.1f} MB file")
+        for name, seconds in (('slpp', slpp_seconds), ('scanner', scan_seconds),
+                              ('first load', load_seconds),
+                              ('cached load', cached_seconds),
+                              ('refresh', refresh_seconds)):
+            print(f"{name:>12}: {seconds * 1000:9.1f} ms")
@@ -0,0 +1,201 @@
+"""Runs a real DataParser end to end on synthetic dumps: update_realm
+(download from a stub API, then parse), write_output and update_historical_db
+against temp SQLite files, for a few hourly snapshots per dump size.\n
+Reports throughput, latency percentiles and peak RSS of every size, and saves
+them as a baseline or compares them with one:
+
+    python -m benchmarks.bench_pipeline [--snapshots N] [--save NAME]
+                                        [--compare NAME] [n_auctions ...]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import auction_data
+import history
+import market
+import own_auctions
+import rollups
+import storage
+from auction_stream import AuctionStream
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import TRACKED_ITEM, write_dump
+from instrumentation import peak_rss
+
+BASELINES = os.path.join(os.path.dirname(__file__), 'baselines')
+RESOURCE = 'data/wow/connected-realm/1/auctions'
+START = 1570000000
+HOUR = 3600
+PHASES = ('update_realm', 'write_output', 'update_historical_db', 'total')
+REGRESSION = 0.1  # slower/bigger than the baseline by more than 10%
+
+
+def create_source_dbs(tmp, n_realms=1, n_items=1, n_sellers=0):
+    """Creates realms and items dbs. The first realm is 'Benchmark' and the
+    first item is the tracked one.
+    """
+    realms = os.path.join(tmp, 'realms.sqlite3')
+    with storage.transaction(realms) as c:
+        # Columns 7 to 10 aren't read by the parser
+        c.execute("""CREATE TABLE realms (id INTEGER PRIMARY KEY, name TEXT,
+                slug TEXT, code TEXT, update_interval INTEGER, last_update INTEGER,
+                last_check INTEGER, json_link TEXT, unused_8, unused_9, unused_10,
+                connected_realm_id INTEGER)""")
+        c.execute("CREATE TABLE sellers (realm_id INTEGER, full_name TEXT)")
+        c.executemany("""INSERT INTO realms VALUES(?, ?, ?, 'eu', 3600, NULL, NULL,
+                NULL, NULL, NULL, NULL, ?)""",
+                      ((i + 1, name, name.lower(), i + 1) for i, name in enumerate(
+                          ['Benchmark'] + [f"Realm{i}" for i in range(1, n_realms)])))
+        c.executemany("INSERT INTO sellers VALUES(?, ?)",
+                      ((realm_id, f"Seller{i}-Realm{realm_id}")
+                       for realm_id in range(1, n_realms + 1) for i in range(n_sellers)))
+
+    items = os.path.join(tmp, 'items.sqlite3')
+    with storage.transaction(items) as c:
+        c.execute("""CREATE TABLE items (item_id INTEGER PRIMARY KEY, name TEXT,
+                short_name TEXT, category_id INTEGER, position INTEGER)""")
+        c.execute("CREATE TABLE stack_sizes (category_id INTEGER, stack_size INTEGER)")
+        c.executemany("INSERT INTO items VALUES(?, ?, 'I', ?, ?)",
+                      ((TRACKED_ITEM - i, f"Item{i}", i % 10, i) for i in range(n_items)))
+        c.executemany("INSERT INTO stack_sizes VALUES(?, ?)",
+                      ((category_id, stack_size) for category_id in range(10)
+                       for stack_size in (1, 20, 200)))
+    return realms, items
+
+
+def stub_parser(tmp, api, source_dbs=None, lua_files=()):
+    """Builds a DataParser whose dbs and temp files live in 'tmp' and whose
+    API clients are 'api's stubs. 'source_dbs' are existing (realms, items)
+    dbs, created by create_source_dbs if not given.
+    """
+    auction_data.REALMS, auction_data.ITEMS = source_dbs or create_source_dbs(tmp)
+    auction_data.CURRENT_DATA = market.CURRENT_DATA = os.path.join(tmp, 'current.sqlite3')
+    auction_data.HISTORICAL_DATA = history.HISTORICAL_DATA = \
+        rollups.HISTORICAL_DATA = os.path.join(tmp, 'historical.sqlite3')
+    auction_data.TEMP_FOLDER = tmp
+    auction_data.LUA_PATH = os.path.join(tmp, 'Multiboxer_AuctionData.lua')
+    auction_data.RAW_RETENTION_DAYS = 0  # synthetic snapshots are old
+    auction_data.wowapi = api.wowapi
+    own_auctions.LUA_FILES = list(lua_files)
+
+    parser = auction_data.DataParser()
+    parser.auction_stream = AuctionStream(
+        'id', 'secret', os.path.join(tmp, 'http_validators.json'),
+        api_url=api.api_url, token_url=api.token_url)
+    return parser
+
+
+def measure(n_auctions, snapshots, results):
+    latencies = {phase: [] for phase in PHASES}
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, 'dump.json')
+        with StubApi({RESOURCE: dump}) as api:
+            parser = stub_parser(tmp, api)
+            realm = parser.realms['Benchmark']
+            for snapshot in range(snapshots):
+                write_dump(dump, n_auctions, seed=snapshot)
+                timestamp = START + snapshot * HOUR
+                os.utime(dump, (timestamp, timestamp))  # dump's Last-Modified
+
+                began = time.perf_counter()
+                parsed_data = parser.update_realm(realm)
+                parser.auction_chunks[realm.name] = parsed_data[0]
+                parser.outlier_rules.observe(realm.name, parsed_data[0])
+                parsed = time.perf_counter()
+                parser.write_output([realm])
+                written = time.perf_counter()
+                parser.update_historical_db([realm])
+                realm.update_db()
+                ended = time.perf_counter()
+
+                latencies['update_realm'].append(parsed - began)
+                latencies['write_output'].append(written - parsed)
+                latencies['update_historical_db'].append(ended - written)
+                latencies['total'].append(ended - began)
+        dump_mb = os.path.getsize(dump) / (1 << 20)
+        storage.close_all()
+
+    stages = {}
+    for record in parser.instrumentation.records:
+        stages.setdefault(record['stage'], []).append(record['duration'])
+    results.put({
+        'dump_mb': dump_mb,
+        'throughput': n_auctions / statistics.median(latencies['total']),
+        'peak_rss_mb': peak_rss() / (1 << 20),
+        'latencies': {phase: summary(values) for phase, values in latencies.items()},
+        'stages': {stage: statistics.median(values) * 1000
+                   for stage, values in stages.items()},
+    })
+
+
+def summary(latencies):
+    """Mean and percentiles of 'latencies' in milliseconds."""
+    latencies = sorted(latencies)
+    result = {'mean': statistics.mean(latencies) * 1000}
+    for p in (50, 90, 99):
+        result[f"p{p}"] = latencies[int(p / 100 * (len(latencies) - 1))] * 1000
+    return result
+
+
+def run(n_auctions, snapshots):
+    """Runs a size in a fresh interpreter so peak RSS is its own."""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=measure, args=(n_auctions, snapshots, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def report(n_auctions, result, baseline=None):
+    def change(new, old, higher_is_better=False):
+        if not old:
+            return ''
+        delta = (new - old) / old
+        worse = -delta if higher_is_better else delta
+        flag = '  REGRESSION' if worse > REGRESSION else ''
+        return f" ({delta:+.0%}{flag})"
+
+    baseline = baseline or {}
+    print(f">> {n_auctions} auctions, {result['dump_mb']:.0f} MB dump")
+    print(f"{'throughput':>20}: {result['throughput']:10.0f} auctions/s"
+          + change(result['throughput'], baseline.get('throughput'), True))
+    print(f"{'peak RSS':>20}: {result['peak_rss_mb']:10.1f} MB"
+          + change(result['peak_rss_mb'], baseline.get('peak_rss_mb')))
+    for phase, latency in result['latencies'].items():
+        old = baseline.get('latencies', {}).get(phase, {})
+        print(f"{phase:>20}: mean {latency['mean']:9.1f} ms  p50 {latency['p50']:9.1f}"
+              f"  p90 {latency['p90']:9.1f}  p99 {latency['p99']:9.1f} ms"
+              + change(latency['p50'], old.get('p50')))
+    print(' ' * 22 + '  '.join(f"{stage} {ms:.1f}"
+                               for stage, ms in result['stages'].items()) + ' (ms)')
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser()
+    args.add_argument('sizes', nargs='*', type=int, default=[10000, 100000, 1000000])
+    args.add_argument('--snapshots', type=int, default=5)
+    args.add_argument('--save', metavar='NAME', help='save results as a baseline')
+    args.add_argument('--compare', metavar='NAME', help='compare with a baseline')
+    args = args.parse_args()
+
+    baselines = {}
+    if args.compare:
+        with open(os.path.join(BASELINES, f"{args.compare}.json")) as file:
+            baselines = json.load(file)
+
+    results = {}
+    for n_auctions in args.sizes:
+        results[str(n_auctions)] = run(n_auctions, args.snapshots)
+        report(n_auctions, results[str(n_auctions)], baselines.get(str(n_auctions)))
+
+    if args.save:
+        os.makedirs(BASELINES, exist_ok=True)
+        with open(os.path.join(BASELINES, f"{args.save}.json"), 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"\n> Saved baseline '{args.save}'")
@@ -0,0 +1,103 @@
+"""Replays an archive of gzipped synthetic dumps of a few realms and reports
+snapshots per minute. Checks that the replayed history matches the one live
+updates write for the same snapshots, and that a replay interrupted halfway
+then resumed ends with the same history.
+
+    python -m benchmarks.bench_replay [n_realms] [n_snapshots] [n_auctions]
+"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import auction_data
+import replay
+import storage
+from benchmarks.bench_pipeline import HOUR, START, create_source_dbs, stub_parser
+from benchmarks.bench_resume import QUERIES
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import write_dump
+
+
+def write_archive(folder, realm_slugs, n_snapshots, n_auctions):
+    for i, realm_slug in enumerate(realm_slugs):
+        os.makedirs(os.path.join(folder, realm_slug))
+        for snapshot in range(n_snapshots):
+            path = os.path.join(folder, realm_slug, f"{START + snapshot * HOUR}.json")
+            write_dump(path, n_auctions, seed=i * n_snapshots + snapshot)
+            if snapshot % 2:
+                with open(path, 'rb') as dump, gzip.open(f"{path}.gz", 'wb') as archived:
+                    shutil.copyfileobj(dump, archived)
+                os.remove(path)
+
+
+def history_rows():
+    return [storage.query(auction_data.HISTORICAL_DATA, sql)
+            for db, sql in QUERIES if db == 'HISTORICAL_DATA']
+
+
+def replayed(archive, n_realms, resume_after=None):
+    """Replays 'archive' into a new historical db, first only its
+    'resume_after' oldest snapshots if given. Returns (history, snapshots
+    applied, snapshots per minute of the last replay).
+    """
+    with tempfile.TemporaryDirectory() as tmp, StubApi({}) as api:
+        source_dbs = create_source_dbs(tmp, n_realms, n_items=1)
+        parser = stub_parser(tmp, api, source_dbs)
+        applied = 0
+        if resume_after:
+            partial = os.path.join(tmp, 'partial')
+            for realm_slug in os.listdir(archive):
+                dumps = sorted(os.listdir(os.path.join(archive, realm_slug)))
+                os.makedirs(os.path.join(partial, realm_slug))
+                for name in dumps[:resume_after]:
+                    shutil.copy(os.path.join(archive, realm_slug, name),
+                                os.path.join(partial, realm_slug))
+            applied += replay.replay(parser, partial, max_parsers=os.cpu_count())
+            storage.close_all()
+            parser = stub_parser(tmp, api, source_dbs)  # restarted
+        began = time.perf_counter()
+        last = replay.replay(parser, archive, max_parsers=os.cpu_count())
+        minutes = (time.perf_counter() - began) / 60
+        result = history_rows(), applied + last, last / minutes
+        storage.close_all()
+    return result
+
+
+def live(archive, n_realms):
+    """Applies the archive's snapshots one at a time the way updates do."""
+    with tempfile.TemporaryDirectory() as tmp, StubApi({}) as api:
+        parser = stub_parser(tmp, api, create_source_dbs(tmp, n_realms, n_items=1))
+        for realm in parser.realms.values():
+            for timestamp, path in replay.archived_dumps(archive, realm.slug):
+                realm.last_update = timestamp
+                auctions = auction_data.parse_dump(path, realm.name, realm.slug,
+                                                   parser.price_ceilings(realm))[0]
+                parser.auction_chunks[realm.name] = auctions
+                parser.outlier_rules.observe(realm.name, auctions)
+                parser.update_historical_db([realm])
+        result = history_rows()
+        storage.close_all()
+    return result
+
+
+if __name__ == '__main__':
+    n_realms = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_snapshots = int(sys.argv[2]) if len(sys.argv) > 2 else 24
+    n_auctions = int(sys.argv[3]) if len(sys.argv) > 3 else 20000
+    with tempfile.TemporaryDirectory() as archive:
+        slugs = ['benchmark'] + [f"realm{i}" for i in range(1, n_realms)]
+        write_archive(archive, slugs, n_snapshots, n_auctions)
+        print(f">> {n_realms} realms x {n_snapshots} snapshots of {n_auctions} auctions")
+
+        rows, applied, per_minute = replayed(archive, n_realms)
+        assert applied == n_realms * n_snapshots, applied
+        print(f"> Replayed {per_minute:.0f} snapshots per minute on {os.cpu_count()} cores")
+        assert rows == live(archive, n_realms), "replay differs from live updates"
+        print("> Same history as live updates")
+        resumed_rows, applied, _ = replayed(archive, n_realms, n_snapshots // 2)
+        assert applied == n_realms * n_snapshots, applied
+        assert resumed_rows == rows, "resumed replay differs"
+        print("> Same history after resuming an interrupted replay")
@@ -0,0 +1,101 @@
+"""Crashes update_all right after each pipeline stage (see progress), restarts
+the parser and times the resumed update against one that never crashed.
+tests/test_resume.py checks that resumed updates end with the same outputs.
+
+    python -m benchmarks.bench_resume [n_auctions]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import auction_data
+import storage
+from benchmarks.bench_pipeline import HOUR, RESOURCE, START, create_source_dbs, stub_parser
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import write_dump
+from progress import STAGES
+
+QUERIES = (
+    ('CURRENT_DATA', """SELECT realm, item_id, price, stack_size, time_left, own
+        FROM auction_chunks ORDER BY realm, item_id, price, own, stack_size"""),
+    ('CURRENT_DATA', "SELECT * FROM market_summary ORDER BY realm, item_id"),
+    ('CURRENT_DATA', "SELECT * FROM market_realms"),
+    ('HISTORICAL_DATA', "SELECT timestamp, realm FROM snapshots ORDER BY timestamp"),
+    ('HISTORICAL_DATA', """SELECT snapshots.timestamp, chunks.item_id, chunks.price,
+            event, snapshot_chunk_events.quantity
+        FROM snapshot_chunk_events JOIN snapshots USING (snapshot_id)
+        JOIN chunks USING (chunk_id) ORDER BY 1, 2, 3, 4, 5"""),
+    ('HISTORICAL_DATA', "SELECT * FROM rollups ORDER BY realm, item_id, grain, bucket"),
+    ('REALMS', "SELECT name, last_update FROM realms"),
+)
+
+
+class Crash(Exception):
+    """Stands in for the process dying right after a stage is recorded."""
+
+
+def crash_after(progress, stage):
+    """Makes 'progress' raise Crash right after it records 'stage'."""
+    record = progress.record
+
+    def crashing_record(realms, recorded_stage, path=None):
+        record(realms, recorded_stage, path)
+        if realms and recorded_stage == stage:
+            raise Crash(f"after {stage}")
+    progress.record = crashing_record
+
+
+def state():
+    """Everything an update writes, but ids and check times."""
+    return [storage.query(getattr(auction_data, db), sql) for db, sql in QUERIES]
+
+
+def snapshot(dump, n_auctions, i):
+    write_dump(dump, n_auctions, seed=i)
+    timestamp = START + i * HOUR
+    os.utime(dump, (timestamp, timestamp))  # dump's Last-Modified
+
+
+def update(tmp, api, source_dbs, crash_stage=None):
+    """Runs update_all on a freshly started parser, crashing after
+    'crash_stage' if given. Returns (seconds, whether it crashed).
+    """
+    storage.close_all()
+    parser = stub_parser(tmp, api, source_dbs)
+    if crash_stage:
+        crash_after(parser.progress, crash_stage)
+    began = time.perf_counter()
+    try:
+        parser.update_all()
+    except Crash:
+        return time.perf_counter() - began, True
+    return time.perf_counter() - began, False
+
+
+def run(n_auctions, crash_stage=None):
+    """Updates to snapshot 0, then to snapshot 1, crashing after
+    'crash_stage' and restarting if given. Returns the seconds of the last
+    update.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        dump = os.path.join(tmp, 'dump.json')
+        with StubApi({RESOURCE: dump}) as api:
+            auction_data.MAX_PARSERS = 2
+            source_dbs = create_source_dbs(tmp)
+            snapshot(dump, n_auctions, 0)
+            update(tmp, api, source_dbs)
+            snapshot(dump, n_auctions, 1)
+            seconds = update(tmp, api, source_dbs, crash_stage)[0]
+            if crash_stage:
+                seconds = update(tmp, api, source_dbs)[0]
+            storage.close_all()
+    return seconds
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    print(f">> {n_auctions} auctions, uninterrupted update {run(n_auctions) * 1000:.1f} ms")
+    for stage in STAGES:
+        seconds = run(n_auctions, stage)
+        print(f"{'crash after ' + stage:>31}: resumed update {seconds * 1000:8.1f} ms")
@@ -0,0 +1,75 @@
+"""Runs UpdateScheduler on a simulated clock against realms publishing dumps
+at their own (unknown to the scheduler) cadence, and reports latency from
+dump publication to the realm's update plus the number of update attempts.
+Every update takes PROCESSING_TIME simulated seconds, overlapping with the
+others up to the scheduler's 'max_concurrent'.
+
+    python -m benchmarks.bench_scheduler [realms] [days]
+"""
+import random
+import statistics
+import sys
+from types import SimpleNamespace
+
+from scheduler import SimulatedClock, SimulatedExecutor, UpdateScheduler
+
+PROCESSING_TIME = 20  # simulated seconds to download, parse and write a dump
+
+
+class SimulatedRealm(SimpleNamespace):
+    """Publishes a dump every 'cadence' seconds, each up to 'lateness' late."""
+
+    def latest_dump(self, now):
+        published = None
+        while self.next_publication <= now:
+            published = self.next_publication
+            self.next_publication += self.cadence + self.rng.uniform(0, self.lateness)
+        return published if published else self.last_published
+
+
+def run(n_realms, days, **scheduler_options):
+    rng = random.Random(0)
+    clock = SimulatedClock(now=0)
+    realms = []
+    for i in range(n_realms):
+        realm = SimulatedRealm(name=f"Realm {i}", update_interval=3600,
+                               cadence=rng.uniform(3500, 3800),
+                               lateness=rng.uniform(0, 300), rng=rng,
+                               last_update=0, last_published=0)
+        realm.next_publication = rng.uniform(0, 3600)
+        realms.append(realm)
+
+    latencies, attempts = [], [0]
+
+    def update(realm):
+        attempts[0] += 1
+        published = realm.latest_dump(clock.time())
+        if not published or published == realm.last_published:
+            return False
+        realm.last_published = realm.last_update = published
+        # The update finishes PROCESSING_TIME later (see SimulatedExecutor)
+        latencies.append(clock.time() + PROCESSING_TIME - published)
+        return True
+
+    scheduler = UpdateScheduler(realms, update, clock=clock,
+                                executor=SimulatedExecutor(clock, PROCESSING_TIME), rng=rng,
+                                verbose=False, **scheduler_options)
+    scheduler.run(until=days * 86400)
+    return latencies, attempts[0], realms
+
+
+if __name__ == '__main__':
+    n_realms = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    print(f">> {n_realms} realms, {days} simulated days")
+    for name, options in (('serial', {'max_concurrent': 1}),
+                          ('fixed 60s', {'backoff': 60, 'max_backoff': 60}),
+                          ('default', {})):
+        latencies, attempts, realms = run(n_realms, days, **options)
+        latencies.sort()
+        # a realm's mean time between dumps is its cadence plus mean lateness
+        errors = [abs(r.update_interval - r.cadence - r.lateness / 2) for r in realms]
+        print(f"{name:>10}: {len(latencies)} updates, {attempts} attempts  "
+              f"latency p50 {latencies[len(latencies) // 2]:5.0f}s "
+              f"p99 {latencies[int(len(latencies) * 0.99)]:5.0f}s  "
+              f"cadence error {statistics.mean(errors):4.0f}s")
@@ -0,0 +1,89 @@
+"""Times DataParser construction on a first start (schema creation, legacy
+session migration, own auctions scan) and on restarts, with many realms,
+items, sellers and per realm checkpoints on disk.
+
+    python -m benchmarks.bench_startup [n_realms]
+"""
+import multiprocessing
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+from auction_columns import AuctionColumns
+from benchmarks.bench_own_auctions import write_saved_variables
+from benchmarks.bench_pipeline import create_source_dbs, stub_parser
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import TRACKED_ITEM
+from checkpoints import CheckpointStore
+
+N_ITEMS = 200
+N_SELLERS = 20
+AUCTIONS_PER_REALM = 5000
+
+
+def realm_auctions(n_auctions):
+    auctions = AuctionColumns()
+    for auc_id in range(n_auctions):
+        auctions.append(auc_id, TRACKED_ITEM, 1 + auc_id % 200, 50 + auc_id % 97,
+                        'LONG')
+    return auctions
+
+
+def prepare(tmp, n_realms):
+    """Leaves 'tmp' as a previous version of the parser would: checkpoints
+    for half of the realms, the other half in the legacy session pickle.
+    """
+    create_source_dbs(tmp, n_realms, N_ITEMS, N_SELLERS)
+    store = CheckpointStore(os.path.join(tmp, 'checkpoints'))
+    auctions = realm_auctions(AUCTIONS_PER_REALM)
+    legacy = {}
+    for i in range(n_realms):
+        slug = 'benchmark' if i == 0 else f"realm{i}"
+        if i % 2:
+            legacy[f"Realm{i}"] = auctions
+        else:
+            store.save(slug, auctions)
+    with open(os.path.join(tmp, '_serialized_data.pickle'), 'wb') as file:
+        pickle.dump((legacy, {}), file)
+    write_saved_variables(os.path.join(tmp, 'Multiboxer_Data.lua'), 200)
+
+
+def measure(tmp, results):
+    source_dbs = (os.path.join(tmp, 'realms.sqlite3'), os.path.join(tmp, 'items.sqlite3'))
+    lua_files = [os.path.join(tmp, 'Multiboxer_Data.lua')]
+    with StubApi({}) as api:
+        began = time.perf_counter()
+        parser = stub_parser(tmp, api, source_dbs, lua_files)
+        constructed = time.perf_counter()
+        parser.own_auctions.refresh()
+        own_loaded = time.perf_counter()
+        parser.price_ceilings(parser.realms['Benchmark'])
+        first_realm = time.perf_counter()
+    results.put({'construct': constructed - began,
+                 'own auctions ready': own_loaded - began,
+                 'first realm session': first_realm - constructed})
+
+
+def run(tmp):
+    """Starts the parser in a fresh interpreter, like a daemon restart."""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=measure, args=(tmp, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+if __name__ == '__main__':
+    n_realms = int(sys.argv[1]) if len(sys.argv) > 1 else 250
+    with tempfile.TemporaryDirectory() as tmp:
+        prepare(tmp, n_realms)
+        print(f">> {n_realms} realms, {N_ITEMS} items, "
+              f"{AUCTIONS_PER_REALM} auctions per realm session")
+        for name in ('first start', 'restart', 'restart'):
+            result = run(tmp)
+            print(f"{name:>12}: " + '  '.join(f"{step} {seconds * 1000:.1f} ms"
+                                                for step, seconds in result.items()))
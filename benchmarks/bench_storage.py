@@ -0,0 +1,70 @@
+"""Compares auction_chunks insert throughput of per row execute() calls on a
+default connection with storage's WAL connection and executemany().
+
+    python -m benchmarks.bench_storage [rows_per_realm] [realms]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import storage
+
+SCHEMA = """CREATE TABLE IF NOT EXISTS auction_chunks (
+    chunk_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+    realm TEXT,
+    item_id INTEGER,
+    quantity INTEGER,
+    price REAL,
+    stack_size INTEGER,
+    time_left TEXT,
+    own INTEGER)"""
+INSERT = """INSERT INTO auction_chunks
+    (realm, item_id, quantity, price, stack_size, time_left, own)
+    VALUES(?, ?, ?, ?, ?, ?, ?)"""
+
+
+def rows(realm, n_rows):
+    return [(realm, 168487, 1, 50 + i / 100, i % 200 + 1, 'LONG', i % 50 == 0)
+            for i in range(n_rows)]
+
+
+def per_row(path, realm_rows):
+    """The old write path: a fresh connection and one execute() per row."""
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute(SCHEMA)
+    for realm, values in realm_rows.items():
+        c.execute("DELETE FROM auction_chunks WHERE realm = ?", (realm, ))
+        for row in values:
+            c.execute(INSERT, row)
+    conn.commit()
+    conn.close()
+
+
+def batched(path, realm_rows):
+    """storage: one transaction and executemany() per realm."""
+    with storage.transaction(path) as c:
+        c.execute(SCHEMA)
+    for realm, values in realm_rows.items():
+        with storage.transaction(path) as c:
+            c.execute("DELETE FROM auction_chunks WHERE realm = ?", (realm, ))
+            c.executemany(INSERT, values)
+
+
+if __name__ == '__main__':
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_realms = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    realm_rows = {f"Realm {i}": rows(f"Realm {i}", n_rows) for i in range(n_realms)}
+    print(f">> {n_realms} realms x {n_rows} rows, written twice")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in (('per row', per_row), ('batched', batched)):
+            path = os.path.join(tmp, f"{name}.sqlite3")
+            start = time.perf_counter()
+            for _ in range(2):  # second pass replaces existing rows
+                write(path, realm_rows)
+            seconds = time.perf_counter() - start
+            print(f"{name:>8}: {seconds:6.2f}s  "
+                  f"{2 * n_realms * n_rows / seconds:10.0f} rows/s")
+        storage.close_all()
@@ -0,0 +1,63 @@
+"""Compares peak RSS and wall time of decoding a whole Auction API dump with
+streaming it through auction_stream.iter_auctions.
+
+    python -m benchmarks.bench_streaming [n_auctions]
+"""
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from auction_stream import item_filter, iter_auctions
+from benchmarks.synthetic import TRACKED_ITEM, write_dump
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def load_whole(path):
+    with open(path, encoding='utf-8') as file:
+        auctions = json.load(file)['auctions']
+    return list(filter(item_filter((TRACKED_ITEM, )), auctions))
+
+
+def load_streaming(path):
+    with open(path, encoding='utf-8') as file:
+        return list(iter_auctions(file, item_filter((TRACKED_ITEM, ))))
+
+
+def measure(loader, path, results):
+    start = time.perf_counter()
+    auctions = loader(path)
+    results.put((time.perf_counter() - start, len(auctions), peak_rss_mb()))
+
+
+def run(loader, path):
+    """Runs 'loader' in a fresh interpreter so peak RSS is its own."""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=measure, args=(loader, path, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+if __name__ == '__main__':
+    n_auctions = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'auctions.json')
+        write_dump(path, n_auctions)
+        size_mb = os.path.getsize(path) / (1 << 20)
+        print(f">> {n_auctions} auctions, {size_mb:.0f} MB dump")
+        for name, loader in (('json.load', load_whole),
+                             ('streaming', load_streaming)):
+            seconds, kept, rss = run(loader, path)
+            print(f"{name:>10}: {seconds:6.2f}s  peak RSS {rss:7.1f} MB  "
+                  f"({kept} auctions kept)")
@@ -0,0 +1,99 @@
+"""Local stand-in for Blizzard's OAuth and Auction API endpoints.\n
+Serves json dumps from files with ETag/Last-Modified validators and answers
+conditional GETs with 304s, so AuctionStream can run without credentials:
+
+    with StubApi({'data/wow/connected-realm/1/auctions': path}) as api:
+        stream = AuctionStream('id', 'secret', api_url=api.api_url,
+                               token_url=api.token_url)
+
+'api.wowapi' replaces the wowapi.WowApi class the same way.
+"""
+import json
+import os
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StubWowApi:
+    """Stands in for a wowapi.WowApi client, reading resources from files."""
+
+    def __init__(self, dumps):
+        self.dumps = dumps
+
+    def get_resource(self, resource, region, *args, **filters):
+        with open(self.dumps[urlsplit(resource).path], encoding='utf-8') as file:
+            return json.load(file)
+
+
+class StubApi:
+    """Serves 'dumps' ({resource: file path}) on a random local port, without
+    Last-Modified headers unless 'last_modified'.
+    """
+
+    def __init__(self, dumps, last_modified=True):
+        self.dumps = dumps
+        self.last_modified = last_modified
+        self.requests = []  # (resource, status) of every dump request
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        base = f"http://127.0.0.1:{self.server.server_port}"
+        self.api_url = base + '/{region}/{resource}'
+        self.token_url = base + '/{region}/oauth/token'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def wowapi(self, client_id, client_secret, **kwargs):
+        """Same signature as wowapi.WowApi."""
+        return StubWowApi(self.dumps)
+
+    def handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                self.send_body(json.dumps({'access_token': 'stub',
+                                           'expires_in': 86400}).encode())
+
+            def do_GET(self):
+                # /{region}/{resource}?query
+                resource = urlsplit(self.path).path.split('/', 2)[2]
+                path = api.dumps.get(resource)
+                if not path:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                mtime = os.path.getmtime(path)
+                etag = f'"{os.path.getsize(path)}-{mtime}"'
+                if self.headers.get('If-None-Match') == etag:
+                    api.requests.append((resource, 304))
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                api.requests.append((resource, 200))
+                headers = {'ETag': etag}
+                if api.last_modified:
+                    headers['Last-Modified'] = formatdate(mtime, usegmt=True)
+                with open(path, 'rb') as file:
+                    self.send_body(file.read(), headers)
+
+            def send_body(self, body, headers={}):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
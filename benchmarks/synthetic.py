@@ -0,0 +1,53 @@
+"""Synthetic Auction API dumps for benchmarking without API credentials."""
+import json
+import random
+
+TIME_LEFT = ('SHORT', 'MEDIUM', 'LONG', 'VERY_LONG')
+TRACKED_ITEM = 168487
+
+
+def generate_auctions(n_auctions, tracked_share=0.02, seed=0):
+    """Yields 'n_auctions' auctions shaped like the connected-realm dump.\n
+    About 'tracked_share' of them are commodity auctions of TRACKED_ITEM,
+    a few of which are priced as outliers.
+    """
+    rng = random.Random(seed)
+    for auc_id in range(1, n_auctions + 1):
+        if rng.random() < tracked_share:
+            unit_price = rng.randint(500000, 3000000)
+            if rng.random() < 0.01:
+                unit_price *= 100  # price pushers above the outlier cutoff
+            yield {
+                'id': auc_id,
+                'item': {'id': TRACKED_ITEM},
+                'quantity': rng.randint(1, 200),
+                'unit_price': unit_price,
+                'time_left': rng.choice(TIME_LEFT),
+            }
+        else:
+            yield {
+                'id': auc_id,
+                # below TRACKED_ITEM, so only commodities are ever tracked
+                'item': {'id': rng.randint(1000, 160000),
+                         'bonus_lists': [rng.randint(1, 7000)],
+                         'modifiers': [{'type': 9, 'value': 50}]},
+                'buyout': rng.randint(10000, 100000000),
+                'quantity': 1,
+                'time_left': rng.choice(TIME_LEFT),
+            }
+
+
+def write_dump(path, n_auctions, **kwargs):
+    """Writes a synthetic dump of 'n_auctions' to 'path' one auction at a
+    time, so generating millions of auctions needs no memory.
+    """
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write('{"_links": {"self": {"href": "https://eu.api.blizzard.com/'
+                   'data/wow/connected-realm/1/auctions"}}, '
+                   '"connected_realm": {"href": "https://eu.api.blizzard.com/'
+                   'data/wow/connected-realm/1"}, "auctions": [')
+        for i, auction in enumerate(generate_auctions(n_auctions, **kwargs)):
+            if i:
+                file.write(',')
+            file.write(json.dumps(auction))
+        file.write(']}')
@@ -0,0 +1,57 @@
+import os
+
+from auction_columns import AuctionColumns
+
+
+class CheckpointStore:
+    """Last parsed auctions of every realm, one AuctionColumns file per realm
+    in 'folder', so updating a realm only rewrites that realm's file.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, realm_slug):
+        return os.path.join(self.folder, f"{realm_slug}.columns")
+
+    def save(self, realm_slug, auctions):
+        """Atomically replaces the realm's checkpoint."""
+        auctions.save(self.path(realm_slug))
+
+    def load(self, realm_slug):
+        """Returns the realm's last AuctionColumns or None."""
+        try:
+            return AuctionColumns.load(self.path(realm_slug))
+        except FileNotFoundError:
+            return None
+
+
+class LastSession(dict):
+    """{realm name: last parsed AuctionColumns} loading every realm from its
+    checkpoint on first access, so startup doesn't read all of them.\n
+    'realm_slugs' maps realm names to slugs. 'on_load(realm_name, auctions)'
+    is called for every checkpoint loaded.
+    """
+
+    def __init__(self, store, realm_slugs, on_load=None):
+        super().__init__()
+        self.store = store
+        self.realm_slugs = realm_slugs
+        self.on_load = on_load
+
+    def __missing__(self, realm_name):
+        slug = self.realm_slugs.get(realm_name)
+        auctions = self.store.load(slug) if slug else None
+        if auctions is None:
+            raise KeyError(realm_name)
+        self[realm_name] = auctions
+        if self.on_load:
+            self.on_load(realm_name, auctions)
+        return auctions
+
+    def get(self, realm_name, default=None):
+        try:
+            return self[realm_name]
+        except KeyError:
+            return default
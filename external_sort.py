@@ -0,0 +1,111 @@
+"""Bounded memory sorting of parsed auctions.\n
+Auctions are buffered as AuctionColumns. Past the memory budget the buffer is
+filtered, sorted and spilled to disk as a run (an AuctionColumns file), and
+once every auction is in, the runs are k-way merged back into the order
+filter_sorted gives. A dump that fits the budget never touches the disk.
+"""
+import heapq
+import mmap
+import os
+import shutil
+from array import array
+
+from auction_columns import COLUMNS, HEADER, MAGIC, VERSION, AuctionColumns
+
+# What sorting an auction in memory costs: its columns plus the index list
+# and sort key tuple filter_sorted builds
+SORT_BYTES_PER_AUCTION = 150
+BLOCK = 1 << 16  # auctions read from every run at a time while merging
+
+
+def sort_key(row):
+    """(item_id, price, -id) of an (id, item_id, quantity, price, time_left) row."""
+    return (row[1], row[3], -row[0])
+
+
+def iter_run(path, block=BLOCK):
+    """Yields the (id, item_id, quantity, price, time_left) rows of a run,
+    reading 'block' rows of every column at a time.
+    """
+    with open(path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, length = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not an auction columns file")
+        offsets = []
+        offset = HEADER.size
+        for _, typecode in COLUMNS:
+            offsets.append(offset)
+            offset += length * array(typecode).itemsize
+
+        with memoryview(data) as view:
+            for start in range(0, length, block):
+                end = min(start + block, length)
+                columns = []
+                for (_, typecode), offset in zip(COLUMNS, offsets):
+                    column = array(typecode)
+                    size = column.itemsize
+                    column.frombytes(view[offset + start * size:offset + end * size])
+                    columns.append(column)
+                yield from zip(*columns)
+
+
+def merge_runs(paths):
+    """Merges sorted runs into one AuctionColumns, holding a block of every
+    run and the output at a time.
+    """
+    merged = AuctionColumns()
+    ids, item_ids = merged.ids, merged.item_ids
+    quantities, prices, time_left = merged.quantities, merged.prices, merged.time_left
+    for row in heapq.merge(*map(iter_run, paths), key=sort_key):
+        ids.append(row[0])
+        item_ids.append(row[1])
+        quantities.append(row[2])
+        prices.append(row[3])
+        time_left.append(row[4])
+    return merged
+
+
+class ExternalSorter:
+    """Collects parsed auctions and returns them filtered and sorted like
+    'filter_sorted(auctions, price_ceilings)' would, spilling sorted runs to
+    'folder' whenever sorting the buffered auctions would need more than
+    'memory_budget' bytes (0 never spills).
+    """
+
+    def __init__(self, folder, price_ceilings, memory_budget, filter_sorted):
+        self.folder = folder
+        self.price_ceilings = price_ceilings
+        self.max_buffered = memory_budget // SORT_BYTES_PER_AUCTION
+        self.filter_sorted = filter_sorted
+        self.buffer = AuctionColumns()
+        self.runs = []  # paths of the spilled runs
+        self.count = 0
+
+    def append(self, auc_id, item_id, quantity, price, time_left):
+        self.buffer.append(auc_id, item_id, quantity, price, time_left)
+        self.count += 1
+        if self.max_buffered and len(self.buffer) >= self.max_buffered:
+            self.spill()
+
+    def spill(self):
+        if not self.runs:
+            shutil.rmtree(self.folder, ignore_errors=True)  # runs of a crashed parse
+            os.makedirs(self.folder)
+        path = os.path.join(self.folder, f"{len(self.runs)}.run")
+        self.filter_sorted(self.buffer, self.price_ceilings).save(path)
+        self.runs.append(path)
+        self.buffer = AuctionColumns()
+
+    def sorted(self):
+        """Returns every appended auction kept by the price ceilings, sorted
+        by (item_id, price, -id).
+        """
+        if not self.runs:
+            return self.filter_sorted(self.buffer, self.price_ceilings)
+        if len(self.buffer):
+            self.spill()
+        try:
+            return merge_runs(self.runs)
+        finally:
+            shutil.rmtree(self.folder, ignore_errors=True)
@@ -0,0 +1,257 @@
+"""Schema of, snapshot tracking in and read API for the HISTORICAL_DATA
+database.\n
+Auctions are grouped into chunks: the auctions of an item listed in the same
+snapshot at the same price and time_left. Every snapshot gets one event per
+live chunk ('new', 'seen' or 'changed', with its live quantity) and one per
+chunk that lost auctions ('sold' or 'expired', with the quantity lost).
+"""
+import storage
+from auction_columns import TIME_LEFT
+from settings import HISTORICAL_DATA
+
+LIVE_EVENTS = ('new', 'seen', 'changed')
+EVENTS_COLUMNS = """
+            snapshot_id INTEGER,
+            chunk_id INTEGER,
+            event TEXT,
+            quantity INTEGER,
+            FOREIGN KEY (snapshot_id) REFERENCES snapshots(snapshot_id),
+            FOREIGN KEY (chunk_id) REFERENCES chunks(chunk_id),
+            PRIMARY KEY (snapshot_id, chunk_id, event)"""
+
+
+def create_tables(c):
+    """Creates the historical tables and indexes, migrating databases
+    created before 'chunks.realm', the unique snapshots index and auction
+    events existed.\n
+    Safe to run on every start.
+    """
+    c.execute("""CREATE TABLE IF NOT EXISTS snapshots (
+            snapshot_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+            timestamp INTEGER,
+            realm TEXT)""")
+    c.execute("""CREATE TABLE IF NOT EXISTS chunks (
+            chunk_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT UNIQUE,
+            first_seen INTEGER,
+            item_id INTEGER,
+            price REAL,
+            stack_size INTEGER,
+            time_left TEXT,
+            realm TEXT)""")
+    c.execute(f"""CREATE TABLE IF NOT EXISTS snapshot_chunk_events (
+            {EVENTS_COLUMNS})""")
+    c.execute("""CREATE TABLE IF NOT EXISTS auctions (
+            auc_id INTEGER NOT NULL,
+            chunk_id INTEGER,
+            last_seen INTEGER,
+            quantity INTEGER,
+            time_left TEXT,
+            FOREIGN KEY (chunk_id) REFERENCES chunks(chunk_id),
+            PRIMARY KEY (auc_id, chunk_id))""")
+
+    # chunks had no realm column: take it from the snapshots they were seen in
+    c.execute("PRAGMA table_info(chunks)")
+    if 'realm' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE chunks ADD COLUMN realm TEXT")
+        c.execute("""UPDATE chunks SET realm = (
+                SELECT snapshots.realm FROM snapshot_chunk_events
+                JOIN snapshots USING (snapshot_id)
+                WHERE snapshot_chunk_events.chunk_id = chunks.chunk_id
+                LIMIT 1)""")
+
+    # auctions had no quantity nor time_left: take them from their chunk
+    c.execute("PRAGMA table_info(auctions)")
+    if 'quantity' not in [column[1] for column in c.fetchall()]:
+        c.execute("ALTER TABLE auctions ADD COLUMN quantity INTEGER")
+        c.execute("ALTER TABLE auctions ADD COLUMN time_left TEXT")
+        c.execute("""UPDATE auctions SET (quantity, time_left) = (
+                SELECT stack_size, time_left FROM chunks
+                WHERE chunks.chunk_id = auctions.chunk_id)""")
+
+    # snapshot_chunk_events held one row per (snapshot, chunk) without event:
+    # rebuild it with one row per event, old rows becoming 'seen' events
+    c.execute("PRAGMA table_info(snapshot_chunk_events)")
+    if not [column for column in c.fetchall() if column[1] == 'event' and column[5]]:
+        c.execute(f"CREATE TABLE snapshot_chunk_events_new ({EVENTS_COLUMNS})")
+        c.execute("""INSERT OR IGNORE INTO snapshot_chunk_events_new
+                SELECT snapshot_id, chunk_id, COALESCE(event, 'seen'),
+                    COALESCE(CAST(quantity AS INTEGER), chunks.stack_size)
+                FROM snapshot_chunk_events LEFT JOIN chunks USING (chunk_id)""")
+        c.execute("DROP TABLE snapshot_chunk_events")
+        c.execute("ALTER TABLE snapshot_chunk_events_new RENAME TO snapshot_chunk_events")
+
+    c.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    indexes = [row[0] for row in c.fetchall()]
+    if 'snapshots_realm_timestamp' not in indexes:
+        # Drop duplicate snapshots (and their events) before enforcing uniqueness
+        c.execute("""DELETE FROM snapshots WHERE snapshot_id NOT IN (
+                SELECT MIN(snapshot_id) FROM snapshots GROUP BY realm, timestamp)""")
+        c.execute("""DELETE FROM snapshot_chunk_events WHERE snapshot_id NOT IN (
+                SELECT snapshot_id FROM snapshots)""")
+        c.execute("""CREATE UNIQUE INDEX snapshots_realm_timestamp
+                ON snapshots (realm, timestamp)""")
+    # Connected realms share auction ids, so they're only unique per realm
+    c.execute("DROP INDEX IF EXISTS auctions_auc_id")
+    c.execute("CREATE INDEX IF NOT EXISTS auctions_last_seen ON auctions (last_seen)")
+    c.execute("""CREATE INDEX IF NOT EXISTS chunks_realm_item
+            ON chunks (realm, item_id)""")
+    c.execute("""CREATE INDEX IF NOT EXISTS snapshot_chunk_events_chunk
+            ON snapshot_chunk_events (chunk_id)""")
+
+
+def live_auctions(c, realm_name, timestamp):
+    """Returns {auc_id: (chunk_id, quantity, time_left)} of the auctions in
+    the realm's last snapshot before 'timestamp'.
+    """
+    c.execute("""SELECT MAX(timestamp) FROM snapshots
+            WHERE realm = ? AND timestamp < ?""", (realm_name, timestamp))
+    previous = c.fetchone()[0]
+    if previous is None:
+        return {}
+    c.execute("""SELECT auctions.auc_id, auctions.chunk_id, auctions.quantity,
+                auctions.time_left
+            FROM auctions JOIN chunks USING (chunk_id)
+            WHERE auctions.last_seen = ? AND chunks.realm = ?""", (previous, realm_name))
+    return {auc_id: (chunk_id, quantity, time_left)
+            for auc_id, chunk_id, quantity, time_left in c.fetchall()}
+
+
+def ended_event(time_left):
+    """Guesses why an auction last seen with 'time_left' disappeared: short
+    auctions most likely expired, others were bought out.
+    """
+    return 'expired' if time_left == 'SHORT' else 'sold'
+
+
+def diff_snapshot(previous, auctions):
+    """Diffs a realm's previously live auctions (see live_auctions) with the
+    AuctionColumns of its new snapshot, in one pass over each. Auctions
+    found in the snapshot are popped from 'previous'.\n
+    Returns (new auctions grouped as {(item_id, price, time_left): [indexes
+    into 'auctions']}, [(quantity, time_left, auc_id, chunk_id)] of persisting
+    auctions, {chunk_id: live quantity}, {(chunk_id, event): quantity lost}).
+    """
+    new_chunks = {}
+    persisting = []
+    live = {}
+    lost = {}
+    ids, quantities = auctions.ids, auctions.quantities
+    for i, auc_id in enumerate(ids):
+        old = previous.pop(auc_id, None)
+        if old is None:
+            key = (auctions.item_ids[i], auctions.prices[i], auctions.time_left[i])
+            new_chunks.setdefault(key, []).append(i)
+            continue
+        chunk_id, old_quantity, _ = old
+        quantity = quantities[i]
+        persisting.append((quantity, TIME_LEFT[auctions.time_left[i]], auc_id, chunk_id))
+        live[chunk_id] = live.get(chunk_id, 0) + quantity
+        if quantity < old_quantity:  # partly bought out
+            lost[(chunk_id, 'sold')] = lost.get((chunk_id, 'sold'), 0) \
+                + old_quantity - quantity
+    # Whatever is left of 'previous' disappeared
+    for chunk_id, quantity, time_left in previous.values():
+        key = (chunk_id, ended_event(time_left))
+        lost[key] = lost.get(key, 0) + quantity
+    return new_chunks, persisting, live, lost
+
+
+def add_snapshot(c, realm_name, timestamp, auctions):
+    """Records a realm snapshot of AuctionColumns: creates chunks of the new
+    auctions, updates persisting ones and writes the snapshot's events, all
+    with bulk statements. Returns the number of events written.
+    """
+    previous = live_auctions(c, realm_name, timestamp)
+    previous_live = {}
+    for chunk_id, quantity, _ in previous.values():
+        previous_live[chunk_id] = previous_live.get(chunk_id, 0) + quantity
+
+    c.execute("INSERT INTO snapshots(timestamp, realm) VALUES(?, ?)",
+              (timestamp, realm_name))
+    snapshot_id = c.lastrowid
+    new_chunks, persisting, live, lost = diff_snapshot(previous, auctions)
+
+    # Chunk ids are handed out here so new chunks and their auctions can be
+    # inserted with executemany: nothing else writes while in the transaction
+    c.execute("SELECT seq FROM sqlite_sequence WHERE name = 'chunks'")
+    row = c.fetchone()
+    next_chunk_id = (row[0] if row else 0) + 1
+    chunks, new_auctions, events = [], [], []
+    for chunk_id, ((item_id, price, time_left), indexes) in enumerate(
+            new_chunks.items(), next_chunk_id):
+        quantity = sum(auctions.quantities[i] for i in indexes)
+        chunks.append((chunk_id, timestamp, item_id, price, quantity,
+                       TIME_LEFT[time_left], realm_name))
+        new_auctions.extend((auctions.ids[i], chunk_id, timestamp,
+                             auctions.quantities[i], TIME_LEFT[time_left])
+                            for i in indexes)
+        events.append((snapshot_id, chunk_id, 'new', quantity))
+    for chunk_id, quantity in live.items():
+        event = 'seen' if quantity == previous_live.get(chunk_id) else 'changed'
+        events.append((snapshot_id, chunk_id, event, quantity))
+    events.extend((snapshot_id, chunk_id, event, quantity)
+                  for (chunk_id, event), quantity in lost.items())
+
+    c.executemany("""INSERT INTO chunks(chunk_id, first_seen, item_id, price,
+                stack_size, time_left, realm)
+            VALUES(?, ?, ?, ?, ?, ?, ?)""", chunks)
+    c.executemany("""INSERT INTO auctions(auc_id, chunk_id, last_seen, quantity, time_left)
+            VALUES(?, ?, ?, ?, ?)""", new_auctions)
+    c.executemany(f"""UPDATE auctions SET last_seen = {int(timestamp)},
+                quantity = ?, time_left = ?
+            WHERE auc_id = ? AND chunk_id = ?""", persisting)
+    c.executemany("""INSERT INTO snapshot_chunk_events(snapshot_id, chunk_id, event, quantity)
+            VALUES(?, ?, ?, ?)""", events)
+    return len(events)
+
+
+def snapshot_timestamps(realm, start, end):
+    """Returns the timestamps of the realm's snapshots in [start, end]."""
+    return [row[0] for row in storage.query(
+        HISTORICAL_DATA,
+        """SELECT timestamp FROM snapshots
+        WHERE realm = ? AND timestamp BETWEEN ? AND ?
+        ORDER BY timestamp""", (realm, start, end))]
+
+
+def latest_snapshot(realm):
+    """Returns the timestamp of the realm's latest snapshot, None if it has none."""
+    return storage.query(HISTORICAL_DATA,
+                         "SELECT MAX(timestamp) FROM snapshots WHERE realm = ?",
+                         (realm, ))[0][0]
+
+
+def price_history(realm, item_id, start, end):
+    """Returns (timestamp, min price, quantity) of the item for every realm
+    snapshot in [start, end] it was listed in.
+    """
+    return storage.query(
+        HISTORICAL_DATA,
+        f"""SELECT snapshots.timestamp, MIN(chunks.price),
+            SUM(snapshot_chunk_events.quantity)
+        FROM snapshots
+        JOIN snapshot_chunk_events USING (snapshot_id)
+        JOIN chunks USING (chunk_id)
+        WHERE snapshots.realm = ? AND snapshots.timestamp BETWEEN ? AND ?
+            AND chunks.item_id = ? AND snapshot_chunk_events.event IN {LIVE_EVENTS}
+        GROUP BY snapshots.snapshot_id
+        ORDER BY snapshots.timestamp""", (realm, start, end, item_id))
+
+
+def sales(realm, item_id, start, end):
+    """Returns (timestamp, quantity sold, quantity expired) of the item for
+    every realm snapshot in [start, end] where some of it disappeared.
+    Sold quantities are estimates, see ended_event.
+    """
+    return storage.query(
+        HISTORICAL_DATA,
+        """SELECT snapshots.timestamp,
+            SUM(CASE WHEN event = 'sold' THEN snapshot_chunk_events.quantity ELSE 0 END),
+            SUM(CASE WHEN event = 'expired' THEN snapshot_chunk_events.quantity ELSE 0 END)
+        FROM snapshots
+        JOIN snapshot_chunk_events USING (snapshot_id)
+        JOIN chunks USING (chunk_id)
+        WHERE snapshots.realm = ? AND snapshots.timestamp BETWEEN ? AND ?
+            AND chunks.item_id = ? AND event IN ('sold', 'expired')
+        GROUP BY snapshots.snapshot_id
+        ORDER BY snapshots.timestamp""", (realm, start, end, item_id))
@@ -0,0 +1,207 @@
+"""Per stage timing and resource records of the update pipeline.\n
+Every stage records its duration, the records and bytes it handled, and the
+process' peak RSS while it ran (see StagePeakRss):
+
+    with instrumentation.stage(realm.name, 'write_current') as stage:
+        stage['records_in'] = len(chunks)
+
+Stages listed in the 'profile_stages' setting also run under cProfile (stats
+saved next to the metrics) or tracemalloc (peak traced memory added to the
+record).
+"""
+import cProfile
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def current_rss():
+    """Returns the process' current resident set size in bytes, if known.
+    Only Linux exposes it without third party packages.
+    """
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def high_water_rss():
+    """Returns the process' peak RSS since its last reset_high_water_rss()
+    in bytes, None where /proc/self/status isn't available.
+    """
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+_reset_lock = threading.Lock()
+_peak_before_reset = 0  # process' peak RSS before its last high-water reset
+
+
+def reset_high_water_rss():
+    """Resets the process' RSS high-water mark (VmHWM) to its current RSS.
+    Returns False where it can't be reset (not Linux, or /proc is read-only).
+    """
+    global _peak_before_reset
+    with _reset_lock:
+        before = high_water_rss()
+        try:
+            with open('/proc/self/clear_refs', 'w') as file:
+                file.write('5')
+        except OSError:
+            return False
+        _peak_before_reset = max(_peak_before_reset, before or 0)
+    return True
+
+
+def peak_rss():
+    """Returns the process' peak resident set size in bytes, if known.
+    This is its high-water mark since it started, not a stage's.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    peak = peak if os.uname().sysname == 'Darwin' else peak * 1024
+    # Stages reset the high-water mark ru_maxrss reads on Linux
+    return max(peak, _peak_before_reset)
+
+
+class StagePeakRss:
+    """Measures the process' peak RSS from its creation to stop().\n
+    On Linux the kernel's high-water mark is reset, then read back by stop().
+    Where it can't be reset but the current RSS can be read, a thread samples
+    it every 'interval' seconds instead. Elsewhere the peak is None.
+    Stages running at the same time in one process share the high-water mark,
+    so a stage can report a peak reached by another, or miss one it reached
+    before another stage started.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = None
+        self.sampler = None
+        if not reset_high_water_rss() and current_rss() is not None:
+            self.peak = current_rss()
+            self.done = threading.Event()
+            self.sampler = threading.Thread(target=self.sample, daemon=True)
+            self.sampler.start()
+
+    def sample(self):
+        while not self.done.wait(self.interval):
+            self.peak = max(self.peak, current_rss() or 0)
+
+    def stop(self):
+        """Returns the peak RSS in bytes, if known."""
+        if self.sampler:
+            self.done.set()
+            self.sampler.join()
+            return max(self.peak, current_rss() or 0)
+        return high_water_rss()
+
+
+class Instrumentation:
+    """Collects stage records until they're exported with flush().\n
+    'profile_stages' maps stage names to 'cprofile' or 'tracemalloc'.
+    cProfile stats are written to 'profile_dir'.
+    """
+
+    def __init__(self, profile_stages=None, profile_dir=None):
+        self.profile_stages = profile_stages or {}
+        self.profile_dir = profile_dir
+        self.records = []
+        self.latest = {}  # (realm name, stage): latest exported record
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, realm_name, name):
+        """Context manager timing a stage. Yields its record (a dict) so the
+        stage can add 'records_in', 'records_out' and 'bytes'.
+        """
+        record = {'timestamp': round(time.time()), 'realm': realm_name,
+                  'stage': name, 'pid': os.getpid(), 'records_in': None,
+                  'records_out': None, 'bytes': None}
+        profile = self.profile_stages.get(name)
+        profiler = cProfile.Profile() if profile == 'cprofile' else None
+        if profiler:
+            profiler.enable()
+        elif profile == 'tracemalloc':
+            tracemalloc.start()
+
+        peak = StagePeakRss()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['duration'] = time.perf_counter() - start
+            record['peak_rss'] = peak.stop()
+            if profiler:
+                profiler.disable()
+                if self.profile_dir:
+                    slug = realm_name.lower().replace(' ', '-').replace("'", '')
+                    record['profile'] = os.path.join(
+                        self.profile_dir, f"{slug}-{name}-{record['timestamp']}.prof")
+                    profiler.dump_stats(record['profile'])
+            elif profile == 'tracemalloc':
+                record['traced_peak'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            with self.lock:
+                self.records.append(record)
+
+    def extend(self, records):
+        """Adds records collected by another process' Instrumentation."""
+        with self.lock:
+            self.records.extend(records)
+
+    def flush(self, jsonl_path=None, prometheus_path=None):
+        """Appends the collected records to 'jsonl_path' and rewrites
+        'prometheus_path' with the latest record of every (realm, stage).
+        """
+        # Flushes from concurrent update threads export one at a time
+        with self.lock:
+            records, self.records = self.records, []
+            if not records:
+                return
+            if jsonl_path:
+                with open(jsonl_path, 'a') as file:
+                    for record in records:
+                        file.write(json.dumps(record) + '\n')
+            if prometheus_path:
+                self.write_prometheus(prometheus_path, records)
+
+    def write_prometheus(self, path, records):
+        # Called with self.lock held. Stages missing from this batch keep
+        # their previous values
+        for record in records:
+            self.latest[(record['realm'], record['stage'])] = record
+
+        metrics = (('duration', 'myah_stage_duration_seconds'),
+                   ('records_in', 'myah_stage_records_in'),
+                   ('records_out', 'myah_stage_records_out'),
+                   ('bytes', 'myah_stage_bytes'),
+                   ('peak_rss', 'myah_stage_peak_rss_bytes'))
+        lines = []
+        for field, metric in metrics:
+            lines.append(f"# TYPE {metric} gauge")
+            for (realm_name, stage), record in sorted(self.latest.items()):
+                if record.get(field) is not None:
+                    lines.append(f'{metric}{{realm="{realm_name}",stage="{stage}"}} '
+                                 f"{record[field]}")
+        # Written atomically so a scraper never reads half a file
+        with open(f"{path}.part", 'w') as file:
+            file.write('\n'.join(lines) + '\n')
+        os.replace(f"{path}.part", path)
@@ -0,0 +1,93 @@
+import filecmp
+import os
+import shutil
+import threading
+
+TABLE_NAME = "Multiboxer_AuctionData"
+
+
+def lua_string(text):
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def capped_chunks(chunks, max_price_levels):
+    """Yields the chunks of the 'max_price_levels' lowest prices of every
+    item (all of them if 0). Chunks must be sorted by (item_id, price).
+    """
+    item_id, levels, price = None, 0, None
+    for chunk in chunks:
+        if chunk[0] != item_id:
+            item_id, levels, price = chunk[0], 0, None
+        if chunk[1] != price:
+            levels, price = levels + 1, chunk[1]
+        if not max_price_levels or levels <= max_price_levels:
+            yield chunk
+
+
+class LuaExport:
+    """Writes concatenated auction chunks as a Lua table for Multiboxer:
+
+    Multiboxer_AuctionData = {
+        ["Realm"] = {
+            [item_id] = {{price, quantity, "time_left", own}, ...},
+        },
+    }
+
+    Every realm's entry is kept as a fragment file in 'fragments_folder'.
+    Only updated realms are encoded, and their fragment is replaced only if
+    its content changed. 'path' is rebuilt from the fragments only when one
+    of them changed. Safe to use from several update threads.
+    """
+
+    def __init__(self, path, fragments_folder, max_price_levels=0):
+        self.path = path
+        self.folder = fragments_folder
+        self.max_price_levels = max_price_levels
+        self.lock = threading.Lock()  # one rebuild of 'path' at a time
+        os.makedirs(fragments_folder, exist_ok=True)
+
+    def fragment_path(self, realm_slug):
+        return os.path.join(self.folder, f"{realm_slug}.lua")
+
+    def update_realm(self, realm_name, realm_slug, chunks):
+        """Encodes a realm's chunks (sorted [item_id, price, quantity,
+        time_left, own] rows) into its fragment. Returns True if it changed.
+        """
+        path = self.fragment_path(realm_slug)
+        with open(f"{path}.part", 'w', encoding='utf-8') as file:
+            file.write(f"\t[{lua_string(realm_name)}] = {{\n")
+            item_id = None
+            for chunk in capped_chunks(chunks, self.max_price_levels):
+                if chunk[0] != item_id:
+                    if item_id is not None:
+                        file.write("\t\t},\n")
+                    item_id = chunk[0]
+                    file.write(f"\t\t[{item_id}] = {{\n")
+                file.write(f"\t\t\t{{{chunk[1]!r}, {chunk[2]}, \"{chunk[3]}\", {chunk[4]}}},\n")
+            if item_id is not None:
+                file.write("\t\t},\n")
+            file.write("\t},\n")
+
+        if os.path.exists(path) and filecmp.cmp(f"{path}.part", path, shallow=False):
+            os.remove(f"{path}.part")
+            return False
+        os.replace(f"{path}.part", path)
+        return True
+
+    def write(self, realm_slugs):
+        """Rebuilds 'path' from the fragments of 'realm_slugs', one realm at
+        a time, and replaces it atomically so the game never reads half of it.
+        """
+        part_path = f"{self.path}.{threading.get_ident()}.part"
+        with self.lock:
+            with open(part_path, 'w', encoding='utf-8') as file:
+                file.write(f"{TABLE_NAME} = {{\n")
+                for realm_slug in realm_slugs:
+                    try:
+                        with open(self.fragment_path(realm_slug),
+                                  encoding='utf-8') as fragment:
+                            shutil.copyfileobj(fragment, file)
+                    except FileNotFoundError:
+                        continue  # realm never updated yet
+                file.write("}\n")
+            os.replace(part_path, self.path)
@@ -0,0 +1,139 @@
+"""Per (realm, item) market summary in the CURRENT_DATA database, and cached
+reads of it for MyAH and scripts.\n
+write_output summarizes every updated realm's concatenated chunks in the
+same transaction that writes its auction_chunks, and stamps the realm's
+last_update in market_realms. Reads are cached in process by
+(realm, item_id, last_update), so a realm's entries go stale, and drop out
+of the LRU, as soon as a newer snapshot of it is written.
+"""
+import bisect
+import math
+from functools import lru_cache
+
+import storage
+from settings import CURRENT_DATA
+
+PERCENTILES = (10, 25, 50, 75, 90)  # quantity weighted
+SUMMARY_COLUMNS = (
+    ('min_price', 'REAL'),
+    *((f"p{p}_price", 'REAL') for p in PERCENTILES),
+    ('quantity', 'INTEGER'),
+    ('own_quantity', 'INTEGER'),
+    ('own_min_price', 'REAL'),  # NULL when there's no own auction
+    ('undercut_quantity', 'INTEGER'),  # listed below own_min_price
+    ('undercut_levels', 'INTEGER'),  # price levels below own_min_price
+)
+CACHE_SIZE = 4096
+
+
+def create_tables(c):
+    columns = ',\n'.join(f"            {name} {kind}" for name, kind in SUMMARY_COLUMNS)
+    c.execute(f"""CREATE TABLE IF NOT EXISTS market_summary (
+            realm TEXT,
+            item_id INTEGER,
+{columns},
+            PRIMARY KEY (realm, item_id))""")
+    c.execute("""CREATE TABLE IF NOT EXISTS market_realms (
+            realm TEXT PRIMARY KEY,
+            last_update INTEGER)""")
+
+
+def summarize_item(item_id, levels):
+    """Returns the summary row of an item's [(price, quantity, own)] chunks,
+    sorted by price.
+    """
+    quantity = sum(level[1] for level in levels)
+    own_quantity = sum(level[1] for level in levels if level[2])
+    percentiles = []
+    cumulative, i = levels[0][1], 0
+    for p in PERCENTILES:
+        target = max(1, math.ceil(quantity * p / 100))
+        while cumulative < target:
+            i += 1
+            cumulative += levels[i][1]
+        percentiles.append(levels[i][0])
+
+    own_min_price = next((level[0] for level in levels if level[2]), None)
+    undercut_quantity = undercut_levels = None
+    if own_min_price is not None:
+        undercut = [level for level in levels
+                    if level[0] < own_min_price and not level[2]]
+        undercut_quantity = sum(level[1] for level in undercut)
+        undercut_levels = len({level[0] for level in undercut})
+    return (item_id, levels[0][0], *percentiles, quantity, own_quantity,
+            own_min_price, undercut_quantity, undercut_levels)
+
+
+def summarize(chunks):
+    """Returns a summary row per item of a realm's concatenated chunks
+    ([item_id, price, quantity, time_left, own] rows sorted by (item_id, price)).
+    """
+    summaries = []
+    item_id, levels = None, []
+    for chunk in chunks:
+        if chunk[0] != item_id:
+            if levels:
+                summaries.append(summarize_item(item_id, levels))
+            item_id, levels = chunk[0], []
+        levels.append((chunk[1], chunk[2], chunk[4]))
+    if levels:
+        summaries.append(summarize_item(item_id, levels))
+    return summaries
+
+
+def write_realm(c, realm_name, last_update, summaries):
+    """Replaces a realm's summary rows and stamps its 'last_update'."""
+    c.execute("DELETE FROM market_summary WHERE realm = ?", (realm_name, ))
+    placeholders = ', '.join('?' * (len(SUMMARY_COLUMNS) + 2))
+    c.executemany(f"INSERT INTO market_summary VALUES({placeholders})",
+                  ((realm_name, ) + summary for summary in summaries))
+    c.execute("INSERT OR REPLACE INTO market_realms VALUES(?, ?)",
+              (realm_name, last_update))
+
+
+def last_update(realm):
+    """Returns the last_update of the realm's summary, None if it has none."""
+    rows = storage.query(CURRENT_DATA,
+                         "SELECT last_update FROM market_realms WHERE realm = ?",
+                         (realm, ))
+    return rows[0][0] if rows else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _item_summary(realm, item_id, last_update):
+    rows = storage.query(CURRENT_DATA, f"""SELECT
+            {', '.join(name for name, _ in SUMMARY_COLUMNS)}
+            FROM market_summary WHERE realm = ? AND item_id = ?""", (realm, item_id))
+    return rows[0] if rows else None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _price_levels(realm, item_id, last_update):
+    rows = storage.query(CURRENT_DATA, """SELECT price, SUM(stack_size)
+            FROM auction_chunks WHERE realm = ? AND item_id = ?
+            GROUP BY price ORDER BY price""", (realm, item_id))
+    prices, cumulative, total = [], [0], 0
+    for price, quantity in rows:
+        total += quantity
+        prices.append(price)
+        cumulative.append(total)
+    return prices, cumulative
+
+
+def item_summary(realm, item_id):
+    """Returns {column: value} of SUMMARY_COLUMNS for the item, None if it
+    isn't listed on the realm.
+    """
+    row = _item_summary(realm, item_id, last_update(realm))
+    return dict(zip((name for name, _ in SUMMARY_COLUMNS), row)) if row else None
+
+
+def volume_below(realm, item_id, price):
+    """Returns the quantity of the item listed strictly below 'price'."""
+    prices, cumulative = _price_levels(realm, item_id, last_update(realm))
+    return cumulative[bisect.bisect_left(prices, price)]
+
+
+def cache_clear():
+    _item_summary.cache_clear()
+    _price_levels.cache_clear()
@@ -0,0 +1,76 @@
+"""NumPy versions of auction_columns.filter_sorted and concatenate_chunks.\n
+Selected with the 'engine' setting set to 'numpy'. Both work on whole
+columns at once and return exactly what the pure Python versions return.
+"""
+import numpy as np
+
+from auction_columns import COLUMNS, TIME_LEFT, AuctionColumns
+
+AUCTION_DTYPE = np.dtype([(name, typecode) for name, typecode in COLUMNS])
+
+
+def to_records(auctions):
+    """Returns AuctionColumns as a structured array."""
+    records = np.empty(len(auctions), dtype=AUCTION_DTYPE)
+    for name, typecode in COLUMNS:
+        records[name] = np.frombuffer(getattr(auctions, name), dtype=typecode)
+    return records
+
+
+def from_records(records):
+    """Returns a structured array as AuctionColumns."""
+    auctions = AuctionColumns()
+    for name, _ in COLUMNS:
+        getattr(auctions, name).frombytes(records[name].tobytes())
+    return auctions
+
+
+def filter_sorted(auctions, price_ceilings):
+    """Returns the auctions of tracked items sorted by (item_id, price, -id).\n
+    'price_ceilings' maps every tracked item_id to the highest price (gold) an
+    auction may have to be kept. Ceilings are looked up through an array
+    indexed by item_id.
+    """
+    records = to_records(auctions)
+    item_ids = records['item_ids']
+    if price_ceilings and len(records):
+        lookup = np.full(max(price_ceilings) + 1, -np.inf)
+        lookup[list(price_ceilings)] = list(price_ceilings.values())
+        in_range = (item_ids >= 0) & (item_ids < len(lookup))
+        ceilings = np.where(in_range, lookup[np.clip(item_ids, 0, len(lookup) - 1)],
+                            -np.inf)
+        records = records[records['prices'] <= ceilings]
+    else:
+        records = records[:0]
+    order = np.lexsort((-records['ids'], records['prices'], records['item_ids']))
+    return from_records(records[order])
+
+
+def concatenate_chunks(auctions, own_ids):
+    """Concatenates adjacent auctions of the same item with the same price
+    and ownership.\n
+    Returns [item_id, price, quantity, time_left, own] rows, where time_left
+    is that of the first auction of every chunk.
+    """
+    if not len(auctions):
+        return []
+    records = to_records(auctions)
+    prices = records['prices']
+    own = np.isin(records['ids'], np.fromiter(own_ids, dtype='i8'))
+
+    item_ids = records['item_ids']
+
+    # Run-length group by (item_id, price, own): a chunk starts wherever any
+    # of them changes
+    starts = np.flatnonzero(np.concatenate(([True], (
+        (item_ids[1:] != item_ids[:-1])
+        | (prices[1:] != prices[:-1])
+        | (own[1:] != own[:-1])))))
+    quantities = np.add.reduceat(records['quantities'].astype('i8'), starts)
+    time_left = np.array(TIME_LEFT)[records['time_left'][starts]]
+
+    return [list(chunk) for chunk in zip(item_ids[starts].tolist(),
+                                         prices[starts].tolist(),
+                                         quantities.tolist(),
+                                         time_left.tolist(),
+                                         own[starts].astype(int).tolist())]
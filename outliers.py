@@ -0,0 +1,73 @@
+import math
+from collections import deque
+from statistics import median
+
+from auction_columns import price_medians
+
+
+class FixedCeiling:
+    """Ignores auctions priced above 'ceiling' gold."""
+
+    window = 1
+
+    def __init__(self, ceiling):
+        self.ceiling = ceiling
+
+    def price_ceiling(self, medians):
+        return self.ceiling
+
+
+class MedianMultiple:
+    """Ignores auctions priced above 'multiple' times the median of the
+    item's median prices in the realm's last 'window' snapshots.
+    """
+
+    def __init__(self, multiple, window=24):
+        self.multiple = multiple
+        self.window = window
+
+    def price_ceiling(self, medians):
+        if not medians:
+            return math.inf  # nothing to compare against yet
+        return self.multiple * median(medians)
+
+
+def rule_from_setting(setting):
+    """Builds an outlier rule from its 'outlier_rules' setting, either
+    {"ceiling": gold} or {"median_multiple": multiple, "window": snapshots}.
+    """
+    if 'ceiling' in setting:
+        return FixedCeiling(setting['ceiling'])
+    return MedianMultiple(setting['median_multiple'], setting.get('window', 24))
+
+
+class OutlierRules:
+    """Per item outlier rules of the tracked items.\n
+    'rules_setting' maps item ids (as strings) to rule settings, with the
+    'default' rule used for items that don't have their own.
+    """
+
+    def __init__(self, item_ids, rules_setting):
+        self.rules = {item_id: rule_from_setting(
+            rules_setting.get(str(item_id), rules_setting['default']))
+            for item_id in item_ids}
+        self.medians = {}  # realm_name: {item_id: deque of median prices}
+
+    def price_ceilings(self, realm_name):
+        """Returns {item_id: price ceiling} for filtering the realm's dump."""
+        realm_medians = self.medians.get(realm_name, {})
+        return {item_id: rule.price_ceiling(realm_medians.get(item_id, ()))
+                for item_id, rule in self.rules.items()}
+
+    def observe(self, realm_name, auctions):
+        """Adds the median prices of a realm's parsed auctions to the
+        rolling windows.
+        """
+        realm_medians = self.medians.setdefault(realm_name, {})
+        for item_id, price in price_medians(auctions).items():
+            rule = self.rules.get(item_id)
+            if not rule:
+                continue
+            if item_id not in realm_medians:
+                realm_medians[item_id] = deque(maxlen=rule.window)
+            realm_medians[item_id].append(price)
@@ -1,38 +1,123 @@
+import json
 import os
-from slpp import slpp as lua
+import re
+import threading
 
-LUA_FILES = [
-    "C:\\_games\\WoW\\wow_0\\_retail_\\WTF\\Account\\461526792#1\\SavedVariables\\Multiboxer_Data.lua",
-    "C:\\_games\\WoW\\wow_5\\_retail_\\WTF\\Account\\461537559#1\\SavedVariables\\Multiboxer_Data.lua"
-]
-STRING_TO_REMOVE = "Multiboxer_DataDB = "
+from settings import *
+
+# Tokens of a SavedVariables file, everything else (commas, blanks) is skipped
+TOKENS = re.compile(r'''
+    \[\s*(?:"((?:[^"\\]|\\.)*)"|(-?\d+))\s*\]\s*=   # [key] =
+  | "(?:[^"\\]|\\.)*"                               # string value
+  | (-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)              # number value
+  | ([{}])                                          # table start or end
+  | --[^\n]*                                        # comment
+  | ([A-Za-z_]\w*)(\s*=(?!=))?                      # name = or true/false/nil
+''', re.VERBOSE)
+
+
+def scan_auction_ids(text):
+    """Returns {realm_name: set of auc_ids} from a Multiboxer_Data.lua text.\n
+    Only realmData[realm].auctionIds[character] tables are looked at, which
+    hold ids either as a list or as [auc_id] = true entries. Way faster than
+    decoding the whole table with slpp.
+    """
+    ids = {}
+    path = []  # keys of the open tables
+    indexes = []  # next positional index of every open table
+    key = None
+    for match in TOKENS.finditer(text):
+        string_key, number_key, number, brace, name, assign = match.groups()
+        if string_key is not None:
+            key = string_key
+        elif number_key is not None:
+            key = int(number_key)
+        elif assign:
+            key = name
+        elif brace == '{':
+            if key is None and indexes:
+                indexes[-1] += 1
+                key = indexes[-1]
+            path.append(key)
+            indexes.append(0)
+            key = None
+        elif brace == '}':
+            path.pop()
+            indexes.pop()
+        elif match.group().startswith('--'):
+            continue
+        else:
+            # A value: auction ids are list entries or [auc_id] = true keys
+            if (len(path) == 5 and path[1] == 'realmData'
+                    and path[3] == 'auctionIds'):
+                if name == 'true' and isinstance(key, int):
+                    ids.setdefault(path[2], set()).add(key)
+                elif number is not None:
+                    ids.setdefault(path[2], set()).add(int(number))
+            if key is None and indexes:
+                indexes[-1] += 1
+            key = None
+    return ids
 
 
 class OwnAuctions:
-    """self.ids = my_auctions_hashtable['realm_name']['auc_id']"""
-
-    def __init__(self):
-        def table_to_dict(path):
-            """Decodes lua SavedVariables table as dict."""
-            if not os.path.exists(path):
-                return {}
-            data = {}
+    """self.ids = my_auctions_hashtable['realm_name']['auc_id']\n
+    Ids scanned from every file of 'lua_files' are cached by file mtime and
+    size, in 'cache_path' too if given, so refresh() only rescans files that
+    changed since the last load.
+    With 'background' the first load runs in a thread, and refresh() waits
+    for it.
+    """
+
+    def __init__(self, lua_files=None, cache_path=None, background=False):
+        self.lua_files = LUA_FILES if lua_files is None else lua_files
+        self.cache_path = cache_path
+        self.files = {}  # path: {'mtime_ns', 'size', 'ids': {realm: [auc_ids]}}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path) as file:
+                self.files = json.load(file)
+        self.ids = {}
+        self.lock = threading.Lock()
+        if background:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        else:
+            self.refresh()
+
+    def refresh(self):
+        """Rescans changed files. Returns True if any did change."""
+        with self.lock:
+            return self._refresh()
+
+    def _refresh(self):
+        changed = False
+        for path in self.lua_files:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                changed |= self.files.pop(path, None) is not None
+                continue
+            cached = self.files.get(path)
+            if cached and (cached['mtime_ns'], cached['size']) == \
+                    (stat.st_mtime_ns, stat.st_size):
+                continue
             with open(path, encoding="utf-8") as file:
-                if file:
-                    data = lua.decode(
-                        file.read().replace(STRING_TO_REMOVE, ''))
-                    return data
-
-        ids = {}
-        for path in LUA_FILES:
-            data = table_to_dict(path)
-            for realm_name, realm in data['realmData'].items():
-                for char_auctions in realm.get('auctionIds', {}).values():
-                    ids[realm_name] = ids.get(realm_name, {})
-                    for auc_id in char_auctions:
-                        ids[realm_name][auc_id] = True
-
-        self.ids = ids
+                ids = scan_auction_ids(file.read())
+            self.files[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                'ids': {realm_name: sorted(auc_ids)
+                                        for realm_name, auc_ids in ids.items()}}
+            changed = True
+
+        if changed or not self.ids:
+            ids = {}
+            for path in self.lua_files:
+                for realm_name, auc_ids in self.files.get(path, {}).get('ids', {}).items():
+                    ids.setdefault(realm_name, {}).update(dict.fromkeys(auc_ids, True))
+            self.ids = ids
+        if changed and self.cache_path:
+            with open(f"{self.cache_path}.part", 'w') as file:
+                json.dump(self.files, file)
+            os.replace(f"{self.cache_path}.part", self.cache_path)
+        return changed
 
 
 if __name__ == '__main__':
@@ -0,0 +1,52 @@
+"""Progress of every realm's update through the pipeline, kept in the REALMS
+database so an update interrupted by a crash resumes from its last completed
+stage instead of downloading and parsing the dump again.\n
+A stage is recorded once its output is safely on disk, every output being
+written atomically:
+    'fetched'             the dump (its path is recorded)
+    'parsed'              the parsed AuctionColumns file (its path is recorded)
+    'current_written'     the checkpoint, CURRENT_DATA and the Lua export
+    'historical_written'  HISTORICAL_DATA, then the realm's row is updated
+"""
+import time
+
+import storage
+
+STAGES = ('fetched', 'parsed', 'current_written', 'historical_written')
+
+
+class PipelineProgress:
+    """Reads and records realms' update progress in the 'path' database."""
+
+    def __init__(self, path):
+        self.path = path
+        with storage.transaction(path) as c:
+            c.execute("""CREATE TABLE IF NOT EXISTS update_progress (
+                    realm TEXT PRIMARY KEY,
+                    snapshot INTEGER,
+                    stage TEXT,
+                    path TEXT,
+                    updated_at INTEGER)""")
+
+    def record(self, realms, stage, path=None):
+        """Records that 'realms' completed 'stage' of updating to their
+        'last_update' snapshot, whose output is at 'path'.
+        """
+        now = round(time.time())
+        with storage.transaction(self.path) as c:
+            c.executemany("INSERT OR REPLACE INTO update_progress VALUES(?, ?, ?, ?, ?)",
+                          ((realm.name, realm.last_update, stage, path, now)
+                           for realm in realms))
+
+    def forget(self, realms):
+        with storage.transaction(self.path) as c:
+            c.executemany("DELETE FROM update_progress WHERE realm = ?",
+                          ((realm.name, ) for realm in realms))
+
+    def pending(self):
+        """Returns {realm name: (snapshot, last completed stage, path)} of the
+        updates that didn't finish.
+        """
+        return {row[0]: row[1:] for row in storage.query(
+            self.path, """SELECT realm, snapshot, stage, path FROM update_progress
+                WHERE stage != ?""", (STAGES[-1], ))}
@@ -0,0 +1,147 @@
+"""Rebuilds HISTORICAL_DATA from archived dumps, so schema changes and parser
+fixes can be applied to past snapshots.\n
+Archived dumps are laid out one folder per realm slug, one file per snapshot
+named after its timestamp, optionally compressed (see open_dump):
+
+    archive/<realm_slug>/<timestamp>.json[.gz|.zst]
+
+Dumps are parsed in parallel across 'max_parsers' processes and applied to
+the historical db in timestamp order per realm, through the same
+update_historical_db as live updates. Snapshots not newer than a realm's
+latest historical snapshot aren't applied again, so an interrupted replay
+resumes where it stopped: only the last few of them are parsed, to warm the
+outlier rules up as an uninterrupted replay would have. To rebuild history
+from scratch, replay into a new 'historical_data' db.
+
+    python replay.py archive [realm_slug ...]
+"""
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import history
+from settings import *
+from auction_columns import AuctionColumns
+from auction_data import DataParser, filter_sorted, parse_dump_to_file, parser_pool
+from outliers import OutlierRules
+
+DUMP_EXTENSIONS = ('.json', '.json.gz', '.json.zst')
+
+
+def archived_dumps(folder, realm_slug):
+    """Returns the realm's [(timestamp, dump path)] in 'folder', oldest first.
+    Files not named after a timestamp are timestamped by their mtime.
+    """
+    folder = os.path.join(folder, realm_slug)
+    if not os.path.isdir(folder):
+        return []
+    dumps = []
+    for name in os.listdir(folder):
+        if not name.endswith(DUMP_EXTENSIONS):
+            continue
+        path = os.path.join(folder, name)
+        stem = name.split('.')[0]
+        timestamp = int(stem) if stem.isdigit() else round(os.path.getmtime(path))
+        dumps.append((timestamp, path))
+    return sorted(dumps)
+
+
+def replay(parser, folder, realm_slugs=None, max_parsers=MAX_PARSERS):
+    """Applies the archived dumps of 'realm_slugs' (all realms if None) in
+    'folder' to HISTORICAL_DATA with 'parser's realms and items.
+    Returns the number of snapshots applied.
+    """
+    realms = [realm for realm in parser.realms.values()
+              if realm_slugs is None or realm.slug in realm_slugs]
+    # Outlier ceilings follow the replayed snapshots, not the live session
+    outlier_rules = OutlierRules([item.item_id for item in parser.items.values()],
+                                 OUTLIER_RULES)
+    tracked_items = {item.item_id: float('inf') for item in parser.items.values()}
+
+    warmup = max(rule.window for rule in outlier_rules.rules.values())
+
+    latest = {}  # realm name: timestamp of its latest historical snapshot
+    pending = {}  # every realm's timestamps to apply (or warm up with), in order
+    jobs = []
+    for realm in realms:
+        latest[realm.name] = history.latest_snapshot(realm.name) or 0
+        dumps = archived_dumps(folder, realm.slug)
+        done = sum(1 for dump in dumps if dump[0] <= latest[realm.name])
+        dumps = dumps[max(0, done - warmup):]
+        pending[realm.name] = deque(timestamp for timestamp, _ in dumps)
+        jobs += [(timestamp, realm.name, path) for timestamp, path in dumps]
+    # Parsed oldest first across realms, so a realm's next snapshot is never
+    # queued behind its later ones
+    jobs = deque(sorted(jobs))
+    print(f">> Replaying snapshots of {len(realms)} realms, {len(jobs)} to parse...")
+
+    def apply(realm, timestamp, columns_path):
+        auctions = filter_sorted(AuctionColumns.load(columns_path),
+                                 outlier_rules.price_ceilings(realm.name))
+        os.remove(columns_path)
+        outlier_rules.observe(realm.name, auctions)
+        if timestamp <= latest[realm.name]:
+            return False  # warm up only
+        realm.last_update = timestamp
+        parser.auction_chunks[realm.name] = auctions
+        parser.update_historical_db([realm], prune=False)
+        return True
+
+    last_updates = {realm.name: realm.last_update for realm in realms}
+    began = time.perf_counter()
+    applied = 0
+    parsed = {}  # (realm name, timestamp): columns path, None if parsing failed
+    parsing = {}
+    window = 2 * max_parsers  # parsed snapshots on disk at most
+    try:
+        with parser_pool(max_parsers) as parsers:
+            while jobs or parsing:
+                while jobs and len(parsing) + len(parsed) < window:
+                    timestamp, realm_name, path = jobs.popleft()
+                    realm = parser.realms[realm_name]
+                    future = parsers.submit(parse_dump_to_file, path, realm.name,
+                                            f"{realm.slug}-{timestamp}", tracked_items,
+                                            temp_db=False)
+                    parsing[future] = (realm_name, timestamp)
+
+                done, _ = wait(parsing, return_when=FIRST_COMPLETED)
+                for future in done:
+                    realm_name, timestamp = parsing.pop(future)
+                    try:
+                        columns_path, records = future.result()
+                    except Exception as err:
+                        print(f"> {realm_name} {timestamp} parsing failed: {err!r}")
+                        columns_path, records = None, []
+                    parser.instrumentation.extend(records)
+                    parsed[(realm_name, timestamp)] = columns_path
+
+                    # Apply the realm's snapshots that are next in line
+                    timestamps = pending[realm_name]
+                    while timestamps and (realm_name, timestamps[0]) in parsed:
+                        timestamp = timestamps.popleft()
+                        columns_path = parsed.pop((realm_name, timestamp))
+                        if columns_path:
+                            applied += apply(parser.realms[realm_name], timestamp,
+                                             columns_path)
+    finally:
+        # Leave the parser's live state as it was
+        for realm in realms:
+            realm.last_update = last_updates[realm.name]
+            parser.auction_chunks.pop(realm.name, None)
+
+    parser.prune_historical_db()  # once, not after every snapshot
+    parser.flush_metrics()
+    minutes = (time.perf_counter() - began) / 60
+    print(f"> Replayed {applied} snapshots, {applied / minutes:.0f} per minute")
+    return applied
+
+
+if __name__ == '__main__':
+    args = argparse.ArgumentParser(description="Rebuilds historical data from archived dumps.")
+    args.add_argument('archive', help="folder of <realm_slug>/<timestamp>.json[.gz|.zst] dumps")
+    args.add_argument('realms', nargs='*', help="realm slugs to replay, all by default")
+    args.add_argument('--parsers', type=int, default=MAX_PARSERS)
+    args = args.parse_args()
+    replay(DataParser(), args.archive, args.realms or None, args.parsers)
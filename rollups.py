@@ -0,0 +1,102 @@
+"""OHLC and volume rollups of item prices per realm, kept in HISTORICAL_DATA.\n
+Every snapshot is folded into its hourly, daily and weekly buckets as it is
+written, so long range charts read a handful of rollup rows and raw snapshot
+data can be pruned after 'raw_retention_days' if it's set.
+"""
+import storage
+from settings import HISTORICAL_DATA
+
+WEEK_OFFSET = 4 * 86400  # the epoch is a Thursday, weeks start on Monday
+GRAINS = {
+    'hour': (3600, 0),
+    'day': (86400, 0),
+    'week': (7 * 86400, WEEK_OFFSET),
+}
+
+
+def create_tables(c):
+    c.execute("""CREATE TABLE IF NOT EXISTS rollups (
+            realm TEXT,
+            item_id INTEGER,
+            grain TEXT,
+            bucket INTEGER,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            samples INTEGER,
+            opened_at INTEGER,
+            closed_at INTEGER,
+            PRIMARY KEY (realm, item_id, grain, bucket))""")
+    # Used by prune_raw
+    c.execute("CREATE INDEX IF NOT EXISTS snapshots_timestamp ON snapshots (timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS chunks_first_seen ON chunks (first_seen)")
+
+
+def bucket_start(timestamp, grain):
+    seconds, offset = GRAINS[grain]
+    return (timestamp - offset) // seconds * seconds + offset
+
+
+def item_prices(auctions):
+    """Returns {item_id: (min price, total quantity)} of AuctionColumns sorted
+    by (item_id, price, -id).
+    """
+    prices = {}
+    for item_id, price, quantity in zip(auctions.item_ids, auctions.prices,
+                                        auctions.quantities):
+        if item_id in prices:
+            prices[item_id][1] += quantity
+        else:
+            prices[item_id] = [price, quantity]  # first auction is the cheapest
+    return prices
+
+
+def add_snapshot(c, realm_name, timestamp, auctions):
+    """Folds a realm snapshot's auctions into the rollups of every grain."""
+    rows = []
+    for item_id, (price, quantity) in item_prices(auctions).items():
+        for grain in GRAINS:
+            rows.append((realm_name, item_id, grain, bucket_start(timestamp, grain),
+                         price, price, price, price, quantity, 1,
+                         timestamp, timestamp))
+    c.executemany("""INSERT INTO rollups VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (realm, item_id, grain, bucket) DO UPDATE SET
+                open = CASE WHEN excluded.opened_at < opened_at
+                    THEN excluded.open ELSE open END,
+                high = MAX(high, excluded.high),
+                low = MIN(low, excluded.low),
+                close = CASE WHEN excluded.closed_at >= closed_at
+                    THEN excluded.close ELSE close END,
+                volume = volume + excluded.volume,
+                samples = samples + 1,
+                opened_at = MIN(opened_at, excluded.opened_at),
+                closed_at = MAX(closed_at, excluded.closed_at)""", rows)
+
+
+def prune_raw(c, before):
+    """Deletes raw snapshot data older than the 'before' timestamp. Rollups
+    are kept.
+    """
+    c.execute("""DELETE FROM snapshot_chunk_events WHERE snapshot_id IN (
+            SELECT snapshot_id FROM snapshots WHERE timestamp < ?)""", (before, ))
+    c.execute("DELETE FROM snapshots WHERE timestamp < ?", (before, ))
+    # Chunks (and their auctions) no longer part of any snapshot
+    c.execute("""DELETE FROM auctions WHERE chunk_id IN (
+            SELECT chunk_id FROM chunks WHERE first_seen < ? AND chunk_id NOT IN (
+                SELECT chunk_id FROM snapshot_chunk_events))""", (before, ))
+    c.execute("""DELETE FROM chunks WHERE first_seen < ? AND chunk_id NOT IN (
+            SELECT chunk_id FROM snapshot_chunk_events)""", (before, ))
+
+
+def rollup_history(realm, item_id, grain, start, end):
+    """Returns (bucket, open, high, low, close, average quantity) rows of the
+    item's 'grain' rollups with buckets in [start, end].
+    """
+    return storage.query(
+        HISTORICAL_DATA,
+        """SELECT bucket, open, high, low, close, volume * 1.0 / samples
+        FROM rollups
+        WHERE realm = ? AND item_id = ? AND grain = ? AND bucket BETWEEN ? AND ?
+        ORDER BY bucket""", (realm, item_id, grain, start, end))
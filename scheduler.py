@@ -0,0 +1,190 @@
+"""Event driven realm update scheduling.\n
+Realms wait in a heap keyed by the time their next dump is expected. Every
+due realm is dispatched right away (up to 'max_concurrent' at a time), late
+dumps are retried with exponential backoff and jitter, and each realm's
+update_interval follows the cadence its dumps are actually published at.
+"""
+import heapq
+import itertools
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+
+class Clock:
+    """Wall clock."""
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, futures, timeout):
+        """Waits until one of 'futures' finishes or 'timeout' seconds pass."""
+        wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+
+
+class SimulatedClock:
+    """Clock that only moves when slept or waited on, for running a scheduler
+    offline. Pair it with SimulatedExecutor.
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+        self.timers = []  # (timestamp, sequence number, callback)
+        self.sequence = itertools.count()
+
+    def time(self):
+        return self.now
+
+    def call_at(self, timestamp, callback):
+        heapq.heappush(self.timers, (timestamp, next(self.sequence), callback))
+
+    def advance(self, until):
+        """Moves to 'until', running the timers due on the way."""
+        while self.timers and self.timers[0][0] <= until:
+            timestamp, _, callback = heapq.heappop(self.timers)
+            self.now = max(self.now, timestamp)
+            callback()
+        self.now = max(self.now, until)
+
+    def sleep(self, seconds):
+        self.advance(self.now + max(seconds, 0))
+
+    def wait(self, futures, timeout):
+        until = self.now + timeout if timeout is not None else None
+        if self.timers and (until is None or self.timers[0][0] < until):
+            until = self.timers[0][0]  # the next task finishes first
+        if until is not None:
+            self.advance(until)
+
+
+class SimulatedExecutor:
+    """Executor running tasks when they're submitted, but finishing their
+    futures 'duration' seconds later on a SimulatedClock, so tasks overlap
+    as they would on real threads.
+    """
+
+    def __init__(self, clock, duration=0):
+        self.clock = clock
+        self.duration = duration
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            result = fn(*args)
+            finish = lambda: future.set_result(result)
+        except Exception as err:
+            finish = lambda: future.set_exception(err)
+        self.clock.call_at(self.clock.time() + self.duration, finish)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class UpdateScheduler:
+    """Runs 'update(realm)' for every realm whenever its next dump is due.\n
+    'update' returns True if the realm got new data and False if its dump
+    wasn't published yet, in which case it's retried after 'backoff' seconds,
+    doubling up to 'max_backoff', each delay randomized by +-'jitter'.
+    Realms are first tried 'grace' seconds after their expected update.
+    """
+
+    def __init__(self, realms, update, clock=None, executor=None,
+                 max_concurrent=4, grace=4, backoff=30, max_backoff=120,
+                 jitter=0.2, cadence_weight=0.2, rng=None, verbose=True):
+        self.update = update
+        self.clock = clock or Clock()
+        self.executor = executor or ThreadPoolExecutor(max_concurrent)
+        self.max_concurrent = max_concurrent
+        self.grace = grace
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.cadence_weight = cadence_weight
+        self.rng = rng or random.Random()
+        self.verbose = verbose
+
+        self.heap = []  # (due timestamp, sequence number, realm)
+        self.sequence = itertools.count()  # breaks ties without comparing realms
+        self.attempts = {}  # realm name: failed attempts since the last update
+        self.running = {}  # future: (realm, last_update before the update)
+        for realm in realms:
+            self.schedule(realm, self.expected_update(realm))
+
+    def expected_update(self, realm):
+        return (realm.last_update or 0) + realm.update_interval + self.grace
+
+    def schedule(self, realm, due):
+        heapq.heappush(self.heap, (due, next(self.sequence), realm))
+
+    def retry_delay(self, realm):
+        attempts = self.attempts.get(realm.name, 0)
+        delay = min(self.backoff * 2 ** attempts, self.max_backoff)
+        self.attempts[realm.name] = attempts + 1
+        return delay * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def learn_cadence(self, realm, previous_update):
+        """Moves update_interval towards the time between the realm's last two
+        dumps. Gaps longer than two intervals (missed dumps) are ignored.
+        """
+        if not previous_update:
+            return
+        interval = realm.last_update - previous_update
+        if 0 < interval <= 2 * realm.update_interval:
+            realm.update_interval = round(
+                (1 - self.cadence_weight) * realm.update_interval
+                + self.cadence_weight * interval)
+
+    def dispatch_due(self):
+        now = self.clock.time()
+        while (self.heap and self.heap[0][0] <= now
+               and len(self.running) < self.max_concurrent):
+            realm = heapq.heappop(self.heap)[2]
+            previous_update = realm.last_update
+            future = self.executor.submit(self.update, realm)
+            self.running[future] = (realm, previous_update)
+
+    def collect_finished(self):
+        """Reschedules realms whose update finished. Returns how many did."""
+        finished = [future for future in self.running if future.done()]
+        for future in finished:
+            realm, previous_update = self.running.pop(future)
+            try:
+                updated = future.result()
+            except Exception as err:
+                if self.verbose:
+                    print(f"> {realm.name} update failed: {err!r}")
+                updated = False
+            if updated:
+                self.attempts.pop(realm.name, None)
+                self.learn_cadence(realm, previous_update)
+                self.schedule(realm, self.expected_update(realm))
+            else:
+                self.schedule(realm, self.clock.time() + self.retry_delay(realm))
+        return len(finished)
+
+    def run(self, until=None):
+        """Dispatches updates forever, or until the clock reaches 'until'."""
+        while until is None or self.clock.time() < until:
+            self.dispatch_due()
+            if self.collect_finished():
+                continue
+
+            timeout = None  # wait for a running update to finish
+            if self.heap and len(self.running) < self.max_concurrent:
+                timeout = max(self.heap[0][0] - self.clock.time(), 0)
+                if until is not None:
+                    timeout = min(timeout, max(until - self.clock.time(), 0))
+            if self.running:
+                self.clock.wait(list(self.running), timeout)
+            elif timeout is None:
+                return  # nothing left to schedule
+            else:
+                if self.verbose and timeout > 60:
+                    realm = self.heap[0][2]
+                    sleep_time = time.strftime("%M:%S", time.gmtime(timeout))
+                    print(f"\n> Next update: {realm.name} in {sleep_time}.")
+                self.clock.sleep(timeout)
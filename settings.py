@@ -8,8 +8,11 @@ with open(SETTINGS_FILE) as f:
     settings = json.load(f)
 
 
-def set_setting(field):
-    return settings['settings'].get(field, None) or settings['default_settings'][field]
+def set_setting(field, default=None):
+    value = settings['settings'].get(field, None)
+    if value is None or value == '':
+        value = settings['default_settings'].get(field, default)
+    return value
 
 
 # Blizz API
@@ -23,3 +26,34 @@ HISTORICAL_DATA = set_setting('historical_data')
 # Paths
 TEMP_FOLDER = set_setting('temp_folder')
 LUA_PATH = set_setting('lua_path')
+# Multiboxer SavedVariables holding own auction ids
+LUA_FILES = set_setting('lua_files', [
+    "C:\\_games\\WoW\\wow_0\\_retail_\\WTF\\Account\\461526792#1\\SavedVariables\\Multiboxer_Data.lua",
+    "C:\\_games\\WoW\\wow_5\\_retail_\\WTF\\Account\\461537559#1\\SavedVariables\\Multiboxer_Data.lua"
+])
+# Parsing
+STREAMING_INGESTION = set_setting('streaming_ingestion', True)
+ENGINE = set_setting('engine', 'python')  # 'python' or 'numpy'
+# {item_id: {"ceiling": gold} or {"median_multiple": x, "window": snapshots}}
+OUTLIER_RULES = set_setting('outlier_rules', {
+    'default': {'median_multiple': 5, 'window': 24},
+    '168487': {'ceiling': 300},
+})
+INCREMENTAL_OUTPUT = set_setting('incremental_output', True)
+LUA_MAX_PRICE_LEVELS = set_setting('lua_max_price_levels', 0)  # per item, 0 keeps all
+# Parsed auctions a parser sorts in memory before spilling sorted runs to
+# TEMP_FOLDER, per parser process. 0 always sorts in memory
+SORT_MEMORY_BUDGET_MB = set_setting('sort_memory_budget_mb', 512)
+# Historical data
+# Days of raw snapshot data kept, 0 keeps it all. Opt-in: rollups only cover
+# snapshots written since they were added, so pruning a db that predates them
+# loses its older history for good (replay its archived dumps first)
+RAW_RETENTION_DAYS = set_setting('raw_retention_days', 0)
+# Concurrency
+MAX_DOWNLOADS = set_setting('max_downloads', 4)
+MAX_PARSERS = set_setting('max_parsers', os.cpu_count())
+# Instrumentation
+METRICS_JSONL = set_setting('metrics_jsonl', os.path.join(TEMP_FOLDER or '', 'metrics.jsonl'))
+METRICS_PROMETHEUS = set_setting('metrics_prometheus')  # textfile collector path
+# {stage: "cprofile" or "tracemalloc"}, profiles saved to TEMP_FOLDER
+PROFILE_STAGES = set_setting('profile_stages', {})
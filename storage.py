@@ -0,0 +1,85 @@
+"""Long-lived SQLite connections, one per database file and process.\n
+Every database is opened in WAL mode so the MyAH webapp can keep reading
+CURRENT_DATA while the parser writes to it. Writes go through transaction(),
+which wraps them in a single explicit transaction.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",  # WAL stays consistent, fsync on checkpoint
+    "PRAGMA cache_size = -65536",  # 64 MB page cache
+    "PRAGMA temp_store = MEMORY",
+)
+
+_connections = {}  # path: (connection, lock)
+_pid = os.getpid()
+_registry_lock = threading.Lock()
+
+
+def connect(path):
+    """Opens a new tuned connection in autocommit mode."""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _connection(path):
+    global _pid
+    with _registry_lock:
+        # Connections must not be shared with forked worker processes
+        if os.getpid() != _pid:
+            _connections.clear()
+            _pid = os.getpid()
+        if path not in _connections:
+            _connections[path] = (connect(path), threading.RLock())
+        return _connections[path]
+
+
+@contextmanager
+def transaction(path):
+    """Context manager yielding a cursor inside one write transaction on
+    'path'. Commits on exit and rolls back if an exception is raised.
+    """
+    conn, lock = _connection(path)
+    with lock:
+        c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            yield c
+        except BaseException:
+            c.execute("ROLLBACK")
+            raise
+        c.execute("COMMIT")
+
+
+def query(path, sql, params=()):
+    """Runs a read query on 'path' and returns all rows."""
+    conn, lock = _connection(path)
+    with lock:
+        return conn.execute(sql, params).fetchall()
+
+
+def close_all():
+    """Closes every connection opened by this process."""
+    with _registry_lock:
+        for conn, _ in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+def ensure_schema(path, version, create_tables):
+    """Runs 'create_tables(cursor)' in a transaction and stamps the database
+    with 'version' (PRAGMA user_version), unless it's at that version already.
+    Returns True if the tables were created or migrated.
+    """
+    if query(path, "PRAGMA user_version")[0][0] >= version:
+        return False
+    with transaction(path) as c:
+        create_tables(c)
+        c.execute(f"PRAGMA user_version = {int(version)}")
+    return True
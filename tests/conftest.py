@@ -0,0 +1,13 @@
+"""Fixtures shared by the tests, which reuse the benchmarks' stand-ins for
+the Blizzard API and the source databases.
+"""
+import pytest
+
+import storage
+
+
+@pytest.fixture
+def tmp(tmp_path):
+    """Temp folder path, whose db connections are closed after the test."""
+    yield str(tmp_path)
+    storage.close_all()
@@ -0,0 +1,41 @@
+import os
+import time
+
+import pytest
+
+from auction_stream import AuctionStream
+from benchmarks.bench_pipeline import RESOURCE, START, stub_parser
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import write_dump
+
+
+@pytest.mark.parametrize('last_modified', [True, False], ids=['last-modified', 'etag only'])
+def test_unchanged_dump_keeps_its_timestamp(tmp, last_modified):
+    dump = os.path.join(tmp, 'dump.json')
+    write_dump(dump, 100)
+    os.utime(dump, (START, START))
+    with StubApi({RESOURCE: dump}, last_modified) as api:
+        stream = AuctionStream('id', 'secret', os.path.join(tmp, 'validators.json'),
+                               api_url=api.api_url, token_url=api.token_url)
+        path = os.path.join(tmp, 'download.json')
+        timestamp, size = stream.download(RESOURCE, 'eu', path)
+        assert size == os.path.getsize(dump)
+        assert timestamp == START if last_modified else timestamp
+        time.sleep(1)
+
+        # Restarted: validators and timestamp are read back from disk
+        stream = AuctionStream('id', 'secret', os.path.join(tmp, 'validators.json'),
+                               api_url=api.api_url, token_url=api.token_url)
+        assert stream.download(RESOURCE, 'eu', path) == (timestamp, 0)
+        assert [status for _, status in api.requests] == [200, 304]
+
+
+def test_etag_only_dump_isnt_updated_again(tmp):
+    dump = os.path.join(tmp, 'dump.json')
+    write_dump(dump, 100)
+    with StubApi({RESOURCE: dump}, last_modified=False) as api:
+        parser = stub_parser(tmp, api)
+        realms = [parser.realms['Benchmark']]
+        assert parser.download_dump(realms)[1] == realms
+        time.sleep(1)
+        assert parser.download_dump(realms)[1] == []
@@ -0,0 +1,64 @@
+"""The NumPy engine returns exactly what the pure Python engine returns."""
+import random
+
+import pytest
+
+import auction_columns
+from auction_columns import TIME_LEFT, AuctionColumns
+
+numpy_engine = pytest.importorskip('numpy_engine')
+
+INF = float('inf')
+
+
+def columns(rows):
+    """AuctionColumns of (id, item_id, quantity, price, time_left) rows."""
+    auctions = AuctionColumns()
+    for row in rows:
+        auctions.append(*row)
+    return auctions
+
+
+def random_rows(n_rows, item_ids, seed=0):
+    rng = random.Random(seed)
+    return [(auc_id, rng.choice(item_ids), rng.randint(1, 200),
+             rng.randint(1, 20) * 10.0, rng.choice(TIME_LEFT))
+            for auc_id in range(1, n_rows + 1)]
+
+
+EQUAL_PRICES = [(auc_id, item_id, 1, 50.0, 'LONG')
+                for auc_id, item_id in enumerate([3, 1, 2, 1, 3, 2, 1], 1)]
+
+CASES = {
+    # name: (rows, price_ceilings, own_ids)
+    'empty input': ([], {1: INF, 2: 100}, {}),
+    'no tracked items': (random_rows(200, [1, 2, 3]), {}, {5: True}),
+    'all own': (random_rows(200, [1, 2]), {1: INF, 2: 150},
+                dict.fromkeys(range(1, 201), True)),
+    'equal prices across items': (EQUAL_PRICES, {1: INF, 2: INF, 3: INF}, {2: True}),
+    'inf ceilings': (random_rows(500, [1, 2, 3, 4]),
+                     dict.fromkeys([1, 2, 3, 4], INF), dict.fromkeys(range(1, 501, 7), True)),
+    'item ids above the ceilings': (random_rows(500, [1, 2, 10, 11, 5000]),
+                                    {1: 100, 2: INF, 10: 150}, {3: True, 4: True}),
+    'mixed': (random_rows(2000, list(range(20)), seed=1),
+              {item_id: 100 if item_id % 2 else INF for item_id in range(0, 20, 3)},
+              dict.fromkeys(range(1, 2001, 13), True)),
+}
+
+
+@pytest.mark.parametrize('rows, price_ceilings, own_ids', CASES.values(), ids=CASES)
+def test_engines_match(rows, price_ceilings, own_ids):
+    auctions = columns(rows)
+    python_sorted = auction_columns.filter_sorted(auctions, price_ceilings)
+    numpy_sorted = numpy_engine.filter_sorted(auctions, price_ceilings)
+    assert list(numpy_sorted) == list(python_sorted)
+    assert (numpy_engine.concatenate_chunks(numpy_sorted, own_ids)
+            == auction_columns.concatenate_chunks(python_sorted, own_ids))
+
+
+def test_filter_sorted_keeps_tracked_auctions_under_their_ceiling():
+    rows, price_ceilings, _ = CASES['item ids above the ceilings']
+    kept = auction_columns.filter_sorted(columns(rows), price_ceilings)
+    assert len(kept)
+    assert all(auc.price <= price_ceilings[auc.item_id] for auc in kept)
+    assert not any(auc.item_id == 5000 for auc in kept)
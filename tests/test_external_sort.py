@@ -0,0 +1,63 @@
+"""ExternalSorter spilling sorted runs returns what sorting in memory does."""
+import os
+import random
+
+import pytest
+
+import auction_columns
+from auction_columns import TIME_LEFT
+from external_sort import SORT_BYTES_PER_AUCTION, ExternalSorter
+
+ENGINES = [auction_columns]
+try:
+    import numpy_engine
+    ENGINES.append(numpy_engine)
+except ImportError:
+    pass
+
+BUFFERED = 7  # auctions buffered before a spill
+N_AUCTIONS = 100  # 14 runs and 2 auctions left in the buffer
+INF = float('inf')
+
+
+def rows(n_rows, seed=0):
+    rng = random.Random(seed)
+    return [(auc_id, rng.randint(1, 5), rng.randint(1, 200),
+             rng.randint(1, 20) * 10.0, rng.choice(TIME_LEFT))
+            for auc_id in range(1, n_rows + 1)]
+
+
+def sort(engine, rows, price_ceilings, folder, memory_budget):
+    sorter = ExternalSorter(folder, price_ceilings, memory_budget, engine.filter_sorted)
+    for row in rows:
+        sorter.append(*row)
+    return sorter.sorted(), sorter
+
+
+@pytest.mark.parametrize('engine', ENGINES, ids=lambda engine: engine.__name__)
+@pytest.mark.parametrize('price_ceilings, any_kept', [
+    ({1: INF, 2: 100, 3: INF, 5: 50}, True),
+    ({1: 5, 2: 5}, False),  # every auction is above its ceiling
+], ids=['some filtered', 'all filtered'])
+def test_spilled_sort_matches_in_memory(tmp_path, engine, price_ceilings, any_kept):
+    auctions = rows(N_AUCTIONS)
+    folder = os.path.join(tmp_path, 'runs')
+    in_memory = sort(engine, auctions, price_ceilings, folder, 0)[0]
+    on_disk, sorter = sort(engine, auctions, price_ceilings, folder,
+                           BUFFERED * SORT_BYTES_PER_AUCTION)
+
+    assert len(sorter.runs) == N_AUCTIONS // BUFFERED + 1  # the partial buffer too
+    assert list(on_disk) == list(in_memory)
+    assert bool(len(on_disk)) == any_kept
+    own_ids = dict.fromkeys(range(1, N_AUCTIONS + 1, 3), True)
+    assert (engine.concatenate_chunks(on_disk, own_ids)
+            == engine.concatenate_chunks(in_memory, own_ids))
+    assert not os.path.exists(folder), "runs left on disk"
+
+
+def test_fitting_the_budget_never_spills(tmp_path):
+    folder = os.path.join(tmp_path, 'runs')
+    sorter = sort(auction_columns, rows(N_AUCTIONS), {1: INF}, folder,
+                  N_AUCTIONS * 2 * SORT_BYTES_PER_AUCTION)[1]
+    assert not sorter.runs
+    assert not os.path.exists(folder)
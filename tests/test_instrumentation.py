@@ -0,0 +1,45 @@
+import os
+import time
+
+import pytest
+
+import instrumentation
+from instrumentation import Instrumentation
+
+MB = 1 << 20
+
+
+def allocate(n_bytes, hold=0):
+    """Touches 'n_bytes' of memory for 'hold' seconds, then frees them."""
+    block = bytearray(n_bytes)
+    block[::4096] = b'\1' * len(block[::4096])
+    time.sleep(hold)
+    del block
+
+
+@pytest.mark.skipif(instrumentation.current_rss() is None, reason="RSS isn't readable")
+def test_peak_rss_is_per_stage(tmp_path):
+    metrics = Instrumentation()
+    with metrics.stage('Realm', 'decode'):
+        allocate(200 * MB)
+    with metrics.stage('Realm', 'write_current'):
+        pass
+    decode, write_current = metrics.records
+    assert decode['peak_rss'] > 200 * MB
+    assert write_current['peak_rss'] < decode['peak_rss'] - 150 * MB
+    # The process' own peak isn't lowered by the stages' resets
+    assert instrumentation.peak_rss() >= decode['peak_rss']
+
+    path = os.path.join(tmp_path, 'metrics.prom')
+    metrics.flush(prometheus_path=path)
+    with open(path) as file:
+        assert (f'myah_stage_peak_rss_bytes{{realm="Realm",stage="decode"}} '
+                f"{decode['peak_rss']}") in file.read()
+
+
+@pytest.mark.skipif(instrumentation.current_rss() is None, reason="RSS isn't readable")
+def test_peak_rss_sampled_without_reset(monkeypatch):
+    monkeypatch.setattr(instrumentation, 'reset_high_water_rss', lambda: False)
+    peak = instrumentation.StagePeakRss(interval=0.001)
+    allocate(200 * MB, hold=0.1)
+    assert peak.stop() > 150 * MB
@@ -0,0 +1,66 @@
+"""Crashes update_all right after each pipeline stage (see progress) and
+checks that the restarted parser resumes the update without downloading the
+dump again, ending with the same CURRENT_DATA, HISTORICAL_DATA and realm
+records as an update that never crashed.
+"""
+import os
+
+import pytest
+
+import auction_data
+import storage
+from benchmarks.bench_pipeline import RESOURCE, create_source_dbs, stub_parser
+from benchmarks.bench_resume import snapshot, state, update
+from benchmarks.stub_api import StubApi
+from progress import STAGES
+
+N_AUCTIONS = 5000
+
+
+def run(tmp, crash_stage=None):
+    """Updates to snapshot 0, then to snapshot 1, crashing after
+    'crash_stage' and restarting if given. Returns (state, whether the
+    update crashed, statuses of the dump requests after the crash).
+    """
+    dump = os.path.join(tmp, 'dump.json')
+    with StubApi({RESOURCE: dump}) as api:
+        source_dbs = create_source_dbs(tmp)
+        snapshot(dump, N_AUCTIONS, 0)
+        update(tmp, api, source_dbs)
+        snapshot(dump, N_AUCTIONS, 1)
+        crashed = update(tmp, api, source_dbs, crash_stage)[1]
+        requests = len(api.requests)
+        update(tmp, api, source_dbs)
+        assert not stub_parser(tmp, api, source_dbs).progress.pending()
+        return state(), crashed, [status for _, status in api.requests[requests:]]
+
+
+@pytest.fixture(autouse=True)
+def parsers(monkeypatch):
+    monkeypatch.setattr(auction_data, 'MAX_PARSERS', 2)
+
+
+@pytest.fixture
+def expected(tmp_path_factory):
+    result = run(str(tmp_path_factory.mktemp('uninterrupted')))[0]
+    storage.close_all()
+    return result
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_update_resumes_after_crash(tmp, expected, stage):
+    result, crashed, statuses = run(tmp, stage)
+    # A crash right after the download is caught with download errors
+    assert crashed or stage == 'fetched'
+    assert 200 not in statuses, "dump downloaded again"
+    for rows, expected_rows in zip(result, expected):
+        assert rows == expected_rows
+
+
+def test_update_realm_leaves_nothing_to_resume(tmp):
+    dump = os.path.join(tmp, 'dump.json')
+    with StubApi({RESOURCE: dump}) as api:
+        snapshot(dump, N_AUCTIONS, 0)
+        parser = stub_parser(tmp, api)
+        parser.update_realm(parser.realms['Benchmark'])
+        assert not parser.progress.pending()
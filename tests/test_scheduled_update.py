@@ -0,0 +1,59 @@
+"""A scheduled update that fails after its download is finished by the
+scheduler's retry, although the dump didn't change since.
+"""
+import os
+from concurrent.futures import Future
+
+import pytest
+
+import auction_data
+import storage
+from benchmarks.bench_pipeline import RESOURCE, START, stub_parser
+from benchmarks.stub_api import StubApi
+from benchmarks.synthetic import write_dump
+
+
+class FailingOnce:
+    """Parser pool whose first job fails. Later jobs run in this process."""
+
+    def __init__(self):
+        self.failed = False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        if self.failed:
+            future.set_result(fn(*args, **kwargs))
+        else:
+            self.failed = True
+            future.set_exception(OSError("parser died"))
+        return future
+
+
+def test_failed_update_is_finished_on_retry(tmp):
+    dump = os.path.join(tmp, 'dump.json')
+    write_dump(dump, 5000)
+    os.utime(dump, (START, START))
+    with StubApi({RESOURCE: dump}) as api:
+        parser = stub_parser(tmp, api)
+        realms = parser.connected_realms()[parser.realms['Benchmark'].url]
+        parsers = FailingOnce()
+
+        with pytest.raises(OSError):
+            parser.scheduled_update(realms, parsers)
+        assert realms[0].last_update is None
+        assert parser.progress.pending()['Benchmark'][1] == 'fetched'
+
+        assert parser.scheduled_update(realms, parsers)
+        assert [status for _, status in api.requests] == [200]
+        assert not parser.progress.pending()
+        assert realms[0].last_update == START
+        assert storage.query(auction_data.CURRENT_DATA,
+                             "SELECT COUNT(*) FROM auction_chunks")[0][0] > 0
+        assert storage.query(auction_data.HISTORICAL_DATA,
+                             "SELECT timestamp FROM snapshots") == [(START, )]
+        assert storage.query(auction_data.REALMS,
+                             "SELECT last_update FROM realms") == [(START, )]
+
+        # Then the unchanged dump is left alone
+        assert not parser.scheduled_update(realms, parsers)
+        assert [status for _, status in api.requests] == [200, 304]